@@ -0,0 +1,39 @@
+import functools
+import hmac
+import os
+
+from flask import request, jsonify
+
+# Admin endpoints are disabled unless ADMIN_TOKEN is set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Token that internal services send to call the service endpoints (e.g. /introspect)
+SERVICE_TOKEN = os.getenv("SERVICE_TOKEN", "")
+
+
+def _token_required(expected, read_token, name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not expected:
+                return jsonify(error=f"{name} endpoints are disabled"), 404
+
+            token = read_token()
+            if not hmac.compare_digest(token.encode(), expected.encode()):
+                return jsonify(error=f"Invalid {name.lower()} token"), 403
+
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _bearer_token():
+    header = request.headers.get("Authorization", "")
+    return header[len("Bearer "):] if header.startswith("Bearer ") else ""
+
+
+# Protect a Flask route with the X-Admin-Token header
+admin_required = _token_required(ADMIN_TOKEN, lambda: request.headers.get("X-Admin-Token", ""), "Admin")
+
+# Protect a Flask route with an "Authorization: Bearer <SERVICE_TOKEN>" header
+service_token_required = _token_required(SERVICE_TOKEN, _bearer_token, "Service")
@@ -1,9 +1,25 @@
 import gradio as gr
+import os
+import logging
+from credential_store import CredentialStore
 
-# Function to simulate login
+logger = logging.getLogger(__name__)
+
+# Local user store with hashed passwords
+credential_store = CredentialStore()
+
+# The well-known demo user is only added when asked for (BASIC_DEMO_USER=1), never by default
+if credential_store.count_users() == 0:
+    if os.getenv("BASIC_DEMO_USER", "").lower() in ("1", "true", "yes"):
+        logger.warning("Adding the demo user user@example.com; do not use BASIC_DEMO_USER outside local demos")
+        credential_store.add_user("user@example.com", "password123")
+    else:
+        logger.warning("No users yet. Add one with: python credential_store.py add <email>")
+
+# Function to check the credentials against the local user store
 def login(email, password):
 
-    if email == "user@example.com" and password == "password123":
+    if credential_store.verify(email, password):
         return f"Welcome, {email}!"
     else:
         return "Invalid email or password. Please try again."
@@ -24,4 +40,6 @@ with gr.Blocks() as app:
 
 # Launch the app
 if __name__ == "__main__":
+    # Start the hashing processes before the server threads
+    credential_store.warm_up()
     app.launch()
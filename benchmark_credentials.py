@@ -0,0 +1,65 @@
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+from credential_store import CredentialStore
+from metrics import LatencyStats
+
+
+# Login thread: alternates known and unknown users until the deadline
+def login_loop(store, users, deadline, stats, counter, lock):
+    i = 0
+    while time.time() < deadline:
+        if i % 2 == 0:
+            email, password = users[i % len(users)]
+        else:
+            email, password = f"unknown-{i}@example.com", "wrong password"
+
+        start = time.perf_counter()
+        store.verify(email, password)
+        stats.record((time.perf_counter() - start) * 1000)
+        i += 1
+    with lock:
+        counter[0] += i
+
+
+def run(pool_sizes, threads, seconds, user_count):
+    directory = tempfile.mkdtemp()
+
+    print(f"{'pool':>5} {'logins/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for pool_size in pool_sizes:
+        store = CredentialStore(path=os.path.join(directory, f"users-{pool_size}.sqlite3"), workers=pool_size)
+        users = [(f"user-{i}@example.com", f"password-{i}") for i in range(user_count)]
+        for email, password in users:
+            store.add_user(email, password)
+        store.warm_up()
+
+        stats = LatencyStats()
+        counter = [0]
+        lock = threading.Lock()
+        deadline = time.time() + seconds
+        workers = [
+            threading.Thread(target=login_loop, args=(store, users, deadline, stats, counter, lock))
+            for _ in range(threads)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        store.close()
+
+        summary = stats.summary()
+        print(f"{pool_size:>5} {counter[0] / seconds:>10.1f} {summary['p50']:>8.1f} {summary['p99']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure sustained password logins per second against the hashing pool size")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads", type=int, default=32, help="Concurrent login requests")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--users", type=int, default=20)
+    args = parser.parse_args()
+
+    run(args.pool_sizes, args.threads, args.seconds, args.users)
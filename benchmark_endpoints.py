@@ -0,0 +1,110 @@
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from endpoint_router import EndpointRouter, RoutedDescopeClient, create_descope_client
+from metrics import LatencyStats
+
+PROJECT_ID = "P" + "0" * 31
+
+
+class StubDescope(ThreadingHTTPServer):
+    """Local stand-in for a Descope region with an injected delay and failure switch"""
+
+    daemon_threads = True
+
+    def __init__(self, delay_ms):
+        super().__init__(("127.0.0.1", 0), StubHandler)
+        self.delay_ms = delay_ms
+        self.failing = False
+        self.requests = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    def _respond(self, body):
+        self.server.requests += 1
+        time.sleep(self.server.delay_ms / 1000)
+        if self.server.failing:
+            self.send_response(503)
+            self.end_headers()
+            return
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._respond({"keys": []})
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self._respond({"url": f"{self.server.url}/idp/login"})
+
+    def log_message(self, format, *args):
+        pass
+
+
+# Function to run calls through the routed client and summarize them
+def run_phase(name, client, stubs, calls):
+    before = {stub.url: stub.requests for stub in stubs}
+    latency = LatencyStats()
+    errors = 0
+    for _ in range(calls):
+        start = time.perf_counter()
+        try:
+            client.sso.start(tenant="tenant", return_url="http://127.0.0.1:5000/verify-sso")
+        except Exception:
+            errors += 1
+        latency.record((time.perf_counter() - start) * 1000)
+
+    summary = latency.summary()
+    print(f"\n{name}: {calls} calls, {errors} errors, p50 {summary['p50']:.1f}ms, p99 {summary['p99']:.1f}ms")
+    for stub in stubs:
+        state = "failing" if stub.failing else "ok"
+        print(f"  {stub.url} delay {stub.delay_ms:>4}ms {state:>7}: {stub.requests - before[stub.url]:>4} requests")
+
+
+def run(delays, calls):
+    stubs = [StubDescope(delay) for delay in delays]
+    for stub in stubs:
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    router = EndpointRouter(
+        [stub.url for stub in stubs],
+        lambda url: create_descope_client(PROJECT_ID, url),
+        probe_path=f"/v2/keys/{PROJECT_ID}",
+        probe_interval=1,
+    )
+    client = RoutedDescopeClient(router)
+    router.probe()
+
+    run_phase("All endpoints healthy", client, stubs, calls)
+
+    fastest = min(stubs, key=lambda stub: stub.delay_ms)
+    fastest.failing = True
+    run_phase(f"Fastest endpoint failing ({fastest.url})", client, stubs, calls)
+
+    fastest.failing = False
+    time.sleep(router.probe_interval * 5 + 0.5)
+    run_phase("Fastest endpoint recovered", client, stubs, calls)
+
+    print("\nEndpoint scores:")
+    for endpoint in router.stats():
+        print(f"  {endpoint}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise latency-aware endpoint routing against local stub servers")
+    parser.add_argument("--delays", type=int, nargs="+", default=[20, 60, 150], help="Injected delay per stub server in ms")
+    parser.add_argument("--calls", type=int, default=100)
+    args = parser.parse_args()
+
+    run(args.delays, args.calls)
@@ -0,0 +1,81 @@
+import argparse
+import json
+import time
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+from descope import DescopeClient
+
+from introspection import ValidTokenCache, SigningKeyGate, introspect_tokens
+
+PROJECT_ID = "P" + "0" * 31
+KEY_ID = "benchmark-key"
+
+
+# Function to build a Descope client that trusts a locally generated signing key
+def create_signing_setup():
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    public_jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    public_jwk.update({"kid": KEY_ID, "alg": "RS256", "use": "sig"})
+
+    client = DescopeClient(project_id=PROJECT_ID, public_key=public_jwk)
+    return client, private_key
+
+
+def create_tokens(private_key, count, kid=KEY_ID):
+    now = int(time.time())
+    return [
+        jwt.encode(
+            {"sub": f"user-{i}", "iss": PROJECT_ID, "iat": now, "exp": now + 3600, "roles": ["user"]},
+            private_key,
+            algorithm="RS256",
+            headers={"kid": kid if kid != "random" else f"bogus-{i}"},
+        )
+        for i in range(count)
+    ]
+
+
+def run(batch_sizes, duplicate_ratio):
+    client, private_key = create_signing_setup()
+    # Valid tokens use the key passed in directly; unknown kids may refresh the keys once per run
+    keys = SigningKeyGate(lambda: client._auth, refresh_interval=float("inf"))
+
+    print(f"{'batch':>7} {'unique':>7} {'cold tok/s':>12} {'warm tok/s':>12} {'cold ms':>9} {'warm ms':>9}")
+    for batch_size in batch_sizes:
+        unique_count = max(1, int(batch_size * (1 - duplicate_ratio)))
+        unique_tokens = create_tokens(private_key, unique_count)
+        tokens = [unique_tokens[i % unique_count] for i in range(batch_size)]
+
+        # Cold: nothing cached yet, every distinct token is verified
+        cache = ValidTokenCache()
+        start = time.perf_counter()
+        results, _ = introspect_tokens(client, tokens, cache, keys)
+        cold = time.perf_counter() - start
+        assert all(result["active"] for result in results)
+
+        # Warm: the same tokens again, answered from the validated token cache
+        start = time.perf_counter()
+        introspect_tokens(client, tokens, cache, keys)
+        warm = time.perf_counter() - start
+
+        print(
+            f"{batch_size:>7} {unique_count:>7} {batch_size / cold:>12.0f} {batch_size / warm:>12.0f} "
+            f"{cold * 1000:>9.1f} {warm * 1000:>9.1f}"
+        )
+
+    # Tokens signed with keys Descope never issued are answered without fetching keys
+    bogus = create_tokens(private_key, max(batch_sizes), kid="random")
+    start = time.perf_counter()
+    results, _ = introspect_tokens(client, bogus, ValidTokenCache(), keys)
+    elapsed = time.perf_counter() - start
+    assert not any(result["active"] for result in results)
+    print(f"\n{len(bogus)} tokens with unknown kids: {elapsed * 1000:.1f} ms, {keys.refreshes} key refreshes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure batch token introspection throughput")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--duplicates", type=float, default=0.0, help="Fraction of duplicate tokens in each batch")
+    args = parser.parse_args()
+
+    run(args.batch_sizes, args.duplicates)
@@ -0,0 +1,121 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+# Five separate processes, as the demos are normally run (ports moved apart so they can run side by side)
+SEPARATE_APPS = [
+    ("basic_gradio_app.py", {"GRADIO_SERVER_PORT": "7901"}, 7901),
+    ("magic_gradio_app.py", {"GRADIO_PORT": "7902", "FLASK_PORT": "5902"}, 7902),
+    ("sso_gradio_app.py", {"GRADIO_PORT": "7903", "FLASK_PORT": "5903"}, 7903),
+    ("social_gradio_app.py", {"GRADIO_PORT": "7904", "FLASK_PORT": "5904"}, 7904),
+    ("descope_gradio_app.py", {"GRADIO_PORT": "7905", "FLASK_PORT": "5905"}, 7905),
+]
+HOST_PORT = 7910
+
+
+def process_tree(pid):
+    pids = [pid]
+    for task in os.listdir(f"/proc/{pid}/task"):
+        try:
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                for child in f.read().split():
+                    pids += process_tree(int(child))
+        except OSError:
+            pass
+    return pids
+
+
+def memory_kb(pid):
+    """Resident (RSS) and proportional (PSS) memory of a process in kB"""
+    rss = pss = 0
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                if line.startswith("Rss:"):
+                    rss = int(line.split()[1])
+                elif line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+def wait_for_http(url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def measure(processes, urls, settle):
+    for url in urls:
+        if not wait_for_http(url):
+            raise RuntimeError(f"{url} did not come up")
+    time.sleep(settle)
+
+    rss = pss = 0
+    for process in processes:
+        for pid in process_tree(process.pid):
+            process_rss, process_pss = memory_kb(pid)
+            rss += process_rss
+            pss += process_pss
+    return rss / 1024, pss / 1024
+
+
+def start(script, env, extra_env):
+    return subprocess.Popen(
+        [sys.executable, script],
+        env={**env, **extra_env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.wait()
+
+
+def run(settle):
+    env = dict(os.environ)
+    env.setdefault("PROJECT_ID", "P" + "0" * 31)
+    env["SHARED_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    env["CREDENTIALS_DB_PATH"] = os.path.join(tempfile.mkdtemp(), "users.sqlite3")
+    env["HASH_WORKERS"] = "1"
+    env["GRADIO_ANALYTICS_ENABLED"] = "False"
+
+    processes = [start(script, env, extra) for script, extra, _ in SEPARATE_APPS]
+    try:
+        separate = measure(processes, [f"http://127.0.0.1:{port}/" for _, _, port in SEPARATE_APPS], settle)
+    finally:
+        stop(processes)
+
+    host = [start("host_all.py", env, {"HOST_PORT": str(HOST_PORT)})]
+    try:
+        hosted = measure(host, [f"http://127.0.0.1:{HOST_PORT}/{prefix}/" for prefix in ("basic", "magic", "sso", "social", "descope")], settle)
+    finally:
+        stop(host)
+
+    print(f"{'setup':<22} {'RSS MiB':>10} {'PSS MiB':>10}")
+    print(f"{'five processes':<22} {separate[0]:>10.1f} {separate[1]:>10.1f}")
+    print(f"{'one host process':<22} {hosted[0]:>10.1f} {hosted[1]:>10.1f}")
+    print(f"{'saved':<22} {separate[0] - hosted[0]:>10.1f} {separate[1] - hosted[1]:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare resident memory of the five demo processes with host_all.py")
+    parser.add_argument("--settle", type=float, default=5, help="Seconds to wait after startup before measuring")
+    args = parser.parse_args()
+
+    run(args.settle)
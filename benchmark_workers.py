@@ -0,0 +1,98 @@
+import argparse
+import http.client
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+# Function to wait until the callback server answers
+def wait_for_server(host, port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/healthz")
+            if conn.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+# Load generator process: sends requests until the deadline and counts them
+def client_loop(host, port, path, deadline, results):
+    count = 0
+    errors = 0
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=5)
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            conn.close()
+            if response.status < 500:
+                count += 1
+            else:
+                errors += 1
+        except OSError:
+            errors += 1
+    results.put((count, errors))
+
+
+def run_load(host, port, path, clients, seconds):
+    results = multiprocessing.Queue()
+    deadline = time.time() + seconds
+    processes = [
+        multiprocessing.Process(target=client_loop, args=(host, port, path, deadline, results))
+        for _ in range(clients)
+    ]
+    for process in processes:
+        process.start()
+    totals = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return sum(t[0] for t in totals), sum(t[1] for t in totals)
+
+
+def benchmark(worker_counts, clients, seconds, path, port):
+    env = dict(os.environ)
+    env.setdefault("PROJECT_ID", "P" + "0" * 31)
+    env["SHARED_STORE_PATH"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    env["CALLBACK_RATE_LIMIT"] = "0"
+
+    print(f"{'workers':>8} {'req/s':>10} {'errors':>8} {'speedup':>8}")
+    baseline = None
+    for workers in worker_counts:
+        launcher = subprocess.Popen(
+            [sys.executable, "launcher.py", "--workers", str(workers), "--ui-workers", "0", "--callback-port", str(port)],
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            if not wait_for_server("127.0.0.1", port):
+                raise RuntimeError("Callback server did not start")
+            run_load("127.0.0.1", port, path, clients, 1)  # Warm up
+            count, errors = run_load("127.0.0.1", port, path, clients, seconds)
+        finally:
+            launcher.terminate()
+            launcher.wait()
+
+        throughput = count / seconds
+        baseline = baseline or throughput
+        print(f"{workers:>8} {throughput:>10.0f} {errors:>8} {throughput / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure callback server throughput against the number of worker processes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=16, help="Number of load generator processes")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--path", default="/healthz")
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    benchmark(args.workers, args.clients, args.seconds, args.path, args.port)
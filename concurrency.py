@@ -0,0 +1,89 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gradio as gr
+
+from metrics import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+
+class ConcurrencyGroup:
+    """
+    Admission control for a group of Gradio event handlers.
+    Handlers in a group share a concurrency limit, a bounded wait queue and a
+    dedicated thread pool, so a slow group cannot starve the rest of the app.
+    """
+
+    def __init__(self, name, limit, max_queue):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self._semaphore = asyncio.Semaphore(limit)
+        self._executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"group-{name}")
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self.wait_ms = LatencyStats()
+        self.service_ms = LatencyStats()
+
+    def wrap(self, fn):
+        """Turn a sync handler into an async one that runs inside this group"""
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with self._lock:
+                if self._waiting >= self.max_queue:
+                    self._rejected += 1
+                    logger.warning(f"Concurrency group {self.name} is full, rejecting {fn.__name__}")
+                    raise gr.Error("The server is busy. Please try again in a moment.")
+                self._waiting += 1
+
+            queued_at = time.perf_counter()
+            try:
+                await self._semaphore.acquire()
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+
+            started_at = time.perf_counter()
+            self.wait_ms.record((started_at - queued_at) * 1000)
+            with self._lock:
+                self._running += 1
+            try:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+                with self._lock:
+                    self._completed += 1
+                return result
+            except Exception:
+                with self._lock:
+                    self._failed += 1
+                raise
+            finally:
+                self.service_ms.record((time.perf_counter() - started_at) * 1000)
+                with self._lock:
+                    self._running -= 1
+                self._semaphore.release()
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                "limit": self.limit,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "waiting": self._waiting,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+        counters["wait_ms"] = self.wait_ms.summary()
+        counters["service_ms"] = self.service_ms.summary()
+        return counters
@@ -0,0 +1,143 @@
+import argparse
+import base64
+import binascii
+import getpass
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+CREDENTIALS_DB_PATH = os.getenv("CREDENTIALS_DB_PATH", "users.sqlite3")
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 1)))
+
+# scrypt cost parameters (n=2**14, r=8 uses 16 MiB and takes tens of milliseconds)
+SCRYPT_N = int(os.getenv("SCRYPT_N", str(2 ** 14)))
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+
+
+def _b64(data):
+    return base64.b64encode(data).decode()
+
+
+def hash_password(password, n=SCRYPT_N, r=SCRYPT_R, p=SCRYPT_P):
+    """Hash a password as "scrypt$n$r$p$salt$hash" """
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=SCRYPT_DKLEN)
+    return f"scrypt${n}${r}${p}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password, encoded):
+    """Check a password against an encoded hash in constant time"""
+    try:
+        algorithm, n, r, p, salt, expected = encoded.split("$")
+        n, r, p = int(n), int(r), int(p)
+        salt, expected = base64.b64decode(salt), base64.b64decode(expected)
+    except (ValueError, binascii.Error):
+        return False
+    if algorithm != "scrypt":
+        return False
+
+    digest = hashlib.scrypt(
+        password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=len(expected)
+    )
+    return hmac.compare_digest(digest, expected)
+
+
+class CredentialStore:
+    """
+    Local email/password users in SQLite. Hashing runs in a process pool so
+    that CPU-heavy scrypt work does not stall the server's threads.
+    """
+
+    def __init__(self, path=CREDENTIALS_DB_PATH, workers=HASH_WORKERS):
+        self.path = path
+        self.workers = workers
+        self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Unknown users are checked against this hash so they take as long as real ones
+        self._dummy_hash = hash_password(secrets.token_urlsafe(16))
+
+        self._connection().execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                email TEXT PRIMARY KEY COLLATE NOCASE,
+                password_hash TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _executor(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def warm_up(self):
+        """Start the hashing processes now instead of on the first login"""
+        list(self._executor().map(verify_password, ["warm-up"] * self.workers, [self._dummy_hash] * self.workers))
+
+    def add_user(self, email, password):
+        password_hash = self._executor().submit(hash_password, password).result()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO users (email, password_hash, created_at) VALUES (?, ?, ?)",
+            (email.strip(), password_hash, time.time()),
+        )
+
+    def remove_user(self, email):
+        self._connection().execute("DELETE FROM users WHERE email = ?", (email.strip(),))
+
+    def count_users(self):
+        return self._connection().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def verify(self, email, password):
+        """Return True if the email exists and the password matches"""
+        row = self._connection().execute(
+            "SELECT password_hash FROM users WHERE email = ?", ((email or "").strip(),)
+        ).fetchone()
+
+        encoded = row[0] if row else self._dummy_hash
+        matches = self._executor().submit(verify_password, password or "", encoded).result()
+        return bool(row) and matches
+
+    def close(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage local users for basic_gradio_app.py")
+    parser.add_argument("command", choices=["add", "remove", "count"])
+    parser.add_argument("email", nargs="?")
+    args = parser.parse_args()
+
+    store = CredentialStore(workers=1)
+    if args.command == "add":
+        store.add_user(args.email, getpass.getpass("Password: "))
+        print(f"User {args.email} saved")
+    elif args.command == "remove":
+        store.remove_user(args.email)
+        print(f"User {args.email} removed")
+    else:
+        print(store.count_users())
+    store.close()
@@ -0,0 +1,12 @@
+import functools
+
+from descope import DescopeClient
+
+
+@functools.lru_cache(maxsize=None)
+def get_descope_client(project_id):
+    """
+    One DescopeClient per project for the whole process, so apps hosted
+    together (see host_all.py) share its connection settings and signing key cache
+    """
+    return DescopeClient(project_id=project_id)
@@ -1,10 +1,27 @@
 import gradio as gr
-from flask import Flask, request, redirect
-from descope import DescopeClient, DeliveryMethod, AuthException
+from flask import Flask, request, redirect, jsonify, render_template, make_response
+from descope import DeliveryMethod, AuthException
+from descope_clients import get_descope_client
 import os
+import json
+import functools
+import secrets
 from dotenv import load_dotenv
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 from threading import Thread
 import logging
+from admin import admin_required, service_token_required
+from introspection import ValidTokenCache, SigningKeyGate, SigningKeysUnavailable, introspect_tokens, INTROSPECTION_MAX_BATCH, INTROSPECTION_KEY_RETRY_INTERVAL
+import profiling
+from profiling import profiled
+from shared_store import SharedStore, RateLimiter
+from rum import RumCollector, rum_script, RUM_CLICK_COOKIE
+from concurrency import ConcurrencyGroup
+from endpoint_router import EndpointRouter, RoutedDescopeClient, create_descope_client
+from session_registry import SessionRegistry, SESSION_KEEPALIVE_INTERVAL
+from pending_flows import PendingFlowRegistry
+from negative_cache import NegativeCache
+from profile_service import ProfileService, token_subject
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -18,60 +35,232 @@ PROJECT_ID = os.getenv("PROJECT_ID")
 if not PROJECT_ID:
     raise ValueError("PROJECT_ID environment variable is not set")
 
-descope_client = DescopeClient(project_id=PROJECT_ID)
+# Optional comma-separated list of Descope base URLs (e.g. one per region). Calls go
+# to the endpoint with the best latency/error score and fail over on transient errors
+DESCOPE_BASE_URLS = [url.strip() for url in os.getenv("DESCOPE_BASE_URLS", "").split(",") if url.strip()]
+
+if DESCOPE_BASE_URLS:
+    endpoint_router = EndpointRouter(
+        DESCOPE_BASE_URLS,
+        lambda url: create_descope_client(PROJECT_ID, url),
+        probe_path=f"/v2/keys/{PROJECT_ID}",
+    )
+    descope_client = RoutedDescopeClient(endpoint_router)
+else:
+    endpoint_router = None
+    descope_client = get_descope_client(PROJECT_ID)
 
 # Flask app setup
 app = Flask(__name__)
 
 # Constants for URLs
-GRADIO_PORT = 7860
-FLASK_PORT = 5000
+GRADIO_PORT = int(os.getenv("GRADIO_PORT", "7860"))
+FLASK_PORT = int(os.getenv("FLASK_PORT", "5000"))
 BASE_URL = f"http://127.0.0.1:{GRADIO_PORT}"
 FLASK_URL = f"http://127.0.0.1:{FLASK_PORT}"
 
+# Shared state so that several worker processes (see launcher.py) can serve the same users
+shared_store = SharedStore()
+HANDOFF_TTL = int(os.getenv("HANDOFF_TTL", "120"))
+CALLBACK_RATE_LIMIT = int(os.getenv("CALLBACK_RATE_LIMIT", "30"))  # Per client IP and minute
+callback_rate_limiter = RateLimiter(shared_store, "callback", limit=CALLBACK_RATE_LIMIT, window=60)
+
+# BrowserState must be encrypted with the same key in every worker process
+BROWSER_STATE_SECRET = os.getenv("BROWSER_STATE_SECRET")
+
+# Static login shell: anonymous visitors get a cacheable HTML page from the
+# callback server instead of booting the Gradio frontend
+LOGIN_SHELL = os.getenv("LOGIN_SHELL", "").lower() in ("1", "true", "yes")
+LOGIN_SHELL_MAX_AGE = int(os.getenv("LOGIN_SHELL_MAX_AGE", "86400"))
+# Non-sensitive cookie telling the servers the browser has a stored session
+SESSION_MARKER_COOKIE = "descope_logged_in"
+
+# Cookie sessions: the callback keeps the tokens in the shared store and sets an HttpOnly
+# signed cookie, so the UI server can send signed-in visitors straight to the main app
+COOKIE_SESSION = os.getenv("COOKIE_SESSION", "").lower() in ("1", "true", "yes")
+COOKIE_SESSION_MAX_AGE = int(os.getenv("COOKIE_SESSION_MAX_AGE", "86400"))
+SESSION_COOKIE = "descope_session"
+MAIN_APP_PATH = "/app"
+session_cookie_serializer = URLSafeTimedSerializer(
+    os.getenv("COOKIE_SESSION_SECRET") or BROWSER_STATE_SECRET or secrets.token_urlsafe(32),
+    salt="descope-session",
+)
+
+# Concurrency groups: handlers that call Descope are isolated from the local session
+# handlers, and both from the app's own events (which use Gradio's default limit)
+auth_upstream_group = ConcurrencyGroup(
+    "auth_upstream",
+    limit=int(os.getenv("AUTH_UPSTREAM_CONCURRENCY", "8")),
+    max_queue=int(os.getenv("AUTH_UPSTREAM_MAX_QUEUE", "64")),
+)
+auth_session_group = ConcurrencyGroup(
+    "auth_session",
+    limit=int(os.getenv("AUTH_SESSION_CONCURRENCY", "16")),
+    max_queue=int(os.getenv("AUTH_SESSION_MAX_QUEUE", "256")),
+)
+APP_CONCURRENCY_LIMIT = int(os.getenv("APP_CONCURRENCY_LIMIT", "4"))
+QUEUE_MAX_SIZE = int(os.getenv("QUEUE_MAX_SIZE", "0")) or None
+
+# Server-side state per Gradio session, released on tab unload or after SESSION_IDLE_TTL
+session_registry = SessionRegistry()
+# Sessions whose component state Gradio keeps in memory (it drops the oldest beyond this)
+SESSION_STATE_CAPACITY = int(os.getenv("SESSION_STATE_CAPACITY", "10000"))
+
+# Login attempts between the start call and the callback, expired after MAGIC/SSO/OAUTH_FLOW_TTL.
+# Kept in the shared store: flows started in a UI worker finish in a callback worker
+pending_flows = PendingFlowRegistry(shared_store)
+
+# Deterministic Descope failures (unknown tenant, invalid email, used code) answered locally for NEGATIVE_CACHE_TTL
+negative_cache = NegativeCache()
+
+# Profiles for the main page, fetched from Descope once per user and cached for PROFILE_CACHE_TTL
+profile_service = ProfileService(lambda refresh_token: descope_client.me(refresh_token))
+
+# Decorator to rate limit the callback endpoints per client IP
+def rate_limited(fn):
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        if not callback_rate_limiter.hit(request.remote_addr):
+            return "Too many requests. Please try again later.", 429
+        return fn(*args, **kwargs)
+    return wrapper
+
+# Function to hand the session tokens over to the Gradio app
+def redirect_with_handoff(auth_type, session_token, refresh_token="", flow=None):
+    if COOKIE_SESSION:
+        return redirect_with_cookie_session(auth_type, session_token, refresh_token)
+
+    # Tokens are kept in the shared store under a one-time id instead of the URL,
+    # so any worker can pick them up on the Gradio side
+    handoff_id = secrets.token_urlsafe(32)
+    shared_store.set("handoff", handoff_id, {
+        "auth_type": auth_type,
+        "session_token": session_token,
+        "refresh_token": refresh_token or "",
+        "origin_session": flow["session_hash"] if flow else None,
+    }, ttl=HANDOFF_TTL)
+    return redirect(f'{BASE_URL}/?auth_type={auth_type}&handoff={handoff_id}')
+
+# Function to start a cookie session and send the browser to the main app
+def redirect_with_cookie_session(auth_type, session_token, refresh_token=""):
+    session_id = secrets.token_urlsafe(32)
+    shared_store.set("cookie_session", session_id, {
+        "auth_type": auth_type,
+        "session_token": session_token,
+        "refresh_token": refresh_token or "",
+    }, ttl=COOKIE_SESSION_MAX_AGE)
+
+    response = redirect(f'{BASE_URL}{MAIN_APP_PATH}/?auth_type={auth_type}')
+    response.set_cookie(
+        SESSION_COOKIE,
+        session_cookie_serializer.dumps(session_id),
+        max_age=COOKIE_SESSION_MAX_AGE,
+        httponly=True,
+        secure=BASE_URL.startswith("https://"),
+        samesite="Lax",
+    )
+    return response
+
+# Function to look up the session behind a signed session cookie (None if missing, forged or expired)
+def read_cookie_session(cookie_value):
+    if not cookie_value:
+        return None
+    try:
+        session_id = session_cookie_serializer.loads(cookie_value, max_age=COOKIE_SESSION_MAX_AGE)
+    except BadSignature:
+        return None
+    session = shared_store.get("cookie_session", session_id)
+    return dict(session, session_id=session_id) if session else None
+
+# Gradio 5.14 never drops finished events from its queue (each one holds its request), their
+# analytics or their tasks, so what its queue keeps for a session is dropped once the session is released
+def forget_gradio_session(queue, session_hash):
+    pending = queue.pending_event_ids_session.get(session_hash) or set()
+    for event_id, event in list(queue.event_ids_to_events.items()):
+        if event.session_hash == session_hash and event_id not in pending:
+            queue.event_ids_to_events.pop(event_id, None)
+            queue.event_analytics.pop(event_id, None)
+    # Event tasks are named "<session_hash>_<fn_index><gradio-sep><event_id>"
+    for task in list(queue._asyncio_tasks):
+        if task.done() and task.get_name().startswith(f"{session_hash}_"):
+            queue._asyncio_tasks.remove(task)
+    if not pending:
+        queue.pending_event_ids_session.pop(session_hash, None)
+        queue.pending_messages_per_session.pop(session_hash, None)
+
+# Function to mark the tab behind request as active, registering it on its first event
+def track_session(request: gr.Request):
+    if session_registry.touch(request.session_hash) and request.request is not None:
+        queue = request.request.app.get_blocks()._queue
+        session_registry.on_release(request.session_hash, functools.partial(forget_gradio_session, queue, request.session_hash))
+
+# Function to register a login attempt for the tab behind request. The flow outlives the
+# tab (magic links open in a new one, SSO and OAuth navigate away), so releasing the
+# tab's session only drops the flow's reference to it
+def start_flow(method, request):
+    if request is None or not request.session_hash:
+        return pending_flows.start(method)
+    track_session(request)
+    flow_id = pending_flows.start(method, request.session_hash)
+    session_registry.on_release(request.session_hash, functools.partial(pending_flows.detach, method, flow_id))
+    return flow_id
+
 # Function to send magic link
-def send_magic_link(email):
+@profiled("send_magic_link")
+def send_magic_link(email, request: gr.Request = None):
+    # The cache key is the exact login ID sent to Descope, so a cached failure only answers that same input
+    email = (email or "").strip()
+    flow_id = start_flow("magic", request)
     try:
         # Generate magic link via Descope's API
-        descope_client.magiclink.sign_up_or_in(
+        negative_cache.call(
+            "magic_email", email,
+            descope_client.magiclink.sign_up_or_in,
             method=DeliveryMethod.EMAIL,
             login_id=email,
-            uri=f"{FLASK_URL}/verify-magic"  # Redirect URI for magic link verification
+            uri=f"{FLASK_URL}/verify-magic/{flow_id}"  # Redirect URI for magic link verification
         )
         return f"Magic link sent to {email}! Please check your inbox."
     except Exception as e:
+        pending_flows.fail("magic", flow_id)
         return f"Error sending magic link: {str(e)}"
 
 # Function to start SSO flow
-def start_sso_flow(tenant_id):
+@profiled("start_sso_flow")
+def start_sso_flow(tenant_id, request: gr.Request = None):
     logger.info(f"Starting SSO flow for tenant ID: {tenant_id}")
     
     if not tenant_id:
         logger.error("Tenant ID is missing")
         return gr.update(), "Please provide a tenant ID."
 
+    flow_id = start_flow("sso", request)
     try:
-        return_url = f"{FLASK_URL}/verify-sso"
+        return_url = f"{FLASK_URL}/verify-sso/{flow_id}"
         logger.info(f"Configured return URL: {return_url}")
                 
         # Start SSO flow
-        sso_response = descope_client.sso.start(tenant=tenant_id, return_url=return_url)
+        sso_response = negative_cache.call("sso_tenant", tenant_id, descope_client.sso.start, tenant=tenant_id, return_url=return_url)
         logger.info("SSO flow initiated successfully")
         logger.debug(f"SSO Response: {sso_response}")
         
         return gr.update(value=""), "SSO flow started. Please continue with Okta authentication."
             
     except AuthException as error:
+        pending_flows.fail("sso", flow_id)
         logger.error(f"Authentication failed: {error.error_message}")
         return gr.update(), f"Authentication Error: {error.error_message}"
     except Exception as e:
+        pending_flows.fail("sso", flow_id)
         logger.error(f"Unexpected error during SSO flow: {str(e)}", exc_info=True)
         return gr.update(), f"Error: {str(e)}"
 
 # Function to start OAuth flow
-def start_oauth_flow():
+@profiled("start_oauth_flow")
+def start_oauth_flow(request: gr.Request = None):
+    flow_id = start_flow("oauth", request)
     try:
-        return_url = f"{FLASK_URL}/verify-oauth"
+        return_url = f"{FLASK_URL}/verify-oauth/{flow_id}"
         logger.info(f"Configured return URL: {return_url}")
         
         # Start OAuth flow      
@@ -82,37 +271,51 @@ def start_oauth_flow():
         return "OAuth flow started. Please continue with Google authentication."
             
     except AuthException as error:
+        pending_flows.fail("oauth", flow_id)
         logger.error(f"Authentication failed: {error.error_message}")
         return f"Authentication Error: {error.error_message}"
     except Exception as e:
+        pending_flows.fail("oauth", flow_id)
         logger.error(f"Unexpected error during OAuth flow: {str(e)}", exc_info=True)
         return f"Error: {str(e)}"
 
+# The flow ID is a path segment so it cannot clash with the parameters Descope appends
 @app.route('/verify-magic')
-def verify_magic_link():
+@app.route('/verify-magic/<flow_id>')
+@rate_limited
+@profiled("verify_magic_link")
+def verify_magic_link(flow_id=None):
     token = request.args.get('t')
 
     if not token:
+        pending_flows.fail("magic", flow_id)
         return "Error: Token is missing from the URL", 400
 
     try:
         # Verify the token with Descope
-        user_response = descope_client.magiclink.verify(token)
-        session_token = user_response.get('sessionToken')
+        user_response = negative_cache.call("magic_token", token, descope_client.magiclink.verify, token)
+        session_token = user_response.get('sessionToken', {}).get('jwt')
+        refresh_token = user_response.get('refreshSessionToken', {}).get('jwt')
 
         if not session_token:
             raise AuthException("Failed to retrieve session token.")
 
-        # Redirect to Gradio app with session token
-        return redirect(f'{BASE_URL}/?auth_type=magic&session_token={session_token}')
+        # Redirect to Gradio app with a session handoff
+        flow = pending_flows.complete("magic", flow_id)
+        return redirect_with_handoff("magic", session_token, refresh_token, flow)
 
     except AuthException as e:
+        pending_flows.fail("magic", flow_id)
         return f"Authentication error: {str(e)}", 400
     except Exception as e:
+        pending_flows.fail("magic", flow_id)
         return f"Error verifying magic link: {str(e)}", 500
 
 @app.route('/verify-sso')
-def verify_sso():
+@app.route('/verify-sso/<flow_id>')
+@rate_limited
+@profiled("verify_sso")
+def verify_sso(flow_id=None):
     code = request.args.get('code')
     error = request.args.get('error')
     error_description = request.args.get('error_description')
@@ -121,33 +324,41 @@ def verify_sso():
     
     if error or error_description:
         logger.error(f"SSO Error: {error} - {error_description}")
+        pending_flows.fail("sso", flow_id)
         return f"Authentication Error: {error_description}", 400
     
     if not code:
         logger.error("Missing code parameter in callback")
+        pending_flows.fail("sso", flow_id)
         return "Error: Missing code parameter.", 400
 
     try:
         # Exchange the code for session tokens
-        jwt_response = descope_client.sso.exchange_token(code)
+        jwt_response = negative_cache.call("sso_code", code, descope_client.sso.exchange_token, code)
         
         session_token = jwt_response["sessionToken"].get("jwt")
         refresh_token = jwt_response["refreshSessionToken"].get("jwt")
 
         if not session_token or not refresh_token:
             logger.error("Missing tokens in response")
+            pending_flows.fail("sso", flow_id)
             return "Error: Invalid token response", 400
 
         logger.info("Session validated and tokens extracted")
         # Redirect to Gradio interface with session tokens
-        return redirect(f'{BASE_URL}/?auth_type=sso&session_token={session_token}&refresh_token={refresh_token}')
+        flow = pending_flows.complete("sso", flow_id)
+        return redirect_with_handoff("sso", session_token, refresh_token, flow)
     
     except Exception as e:
         logger.error(f"Token exchange failed: {str(e)}", exc_info=True)
+        pending_flows.fail("sso", flow_id)
         return f"Error: {str(e)}", 400
 
 @app.route('/verify-oauth')
-def verify_oauth():
+@app.route('/verify-oauth/<flow_id>')
+@rate_limited
+@profiled("verify_oauth")
+def verify_oauth(flow_id=None):
     code = request.args.get('code')
     error = request.args.get('error')
     error_description = request.args.get('error_description')
@@ -156,33 +367,241 @@ def verify_oauth():
     
     if error or error_description:
         logger.error(f"OAuth Error: {error} - {error_description}")
+        pending_flows.fail("oauth", flow_id)
         return f"Authentication Error: {error_description}", 400
     
     if not code:
         logger.error("Missing code parameter in callback")
+        pending_flows.fail("oauth", flow_id)
         return "Error: Missing code parameter.", 400
 
     try:
         # Exchange the code for session tokens
         logger.info("Attempting to exchange code for tokens")
-        jwt_response = descope_client.oauth.exchange_token(code)
+        jwt_response = negative_cache.call("oauth_code", code, descope_client.oauth.exchange_token, code)
         
         session_token = jwt_response["sessionToken"].get("jwt")
         refresh_token = jwt_response["refreshSessionToken"].get("jwt")
         
         if not session_token or not refresh_token:
             logger.error("Missing tokens in response")
+            pending_flows.fail("oauth", flow_id)
             return "Error: Invalid token response", 400
 
         logger.info("Session validated and tokens extracted")
         # Redirect to Gradio interface with session tokens
-        return redirect(f'{BASE_URL}/?auth_type=oauth&session_token={session_token}&refresh_token={refresh_token}')
+        flow = pending_flows.complete("oauth", flow_id)
+        return redirect_with_handoff("oauth", session_token, refresh_token, flow)
     
     except Exception as e:
         logger.error(f"Token exchange failed: {str(e)}", exc_info=True)
+        pending_flows.fail("oauth", flow_id)
         return f"Error: {str(e)}", 400
 
+# Lightweight login page served without the Gradio frontend
+@app.route('/login')
+def login_shell():
+    response = make_response(render_template(
+        "login_shell.html",
+        base_url=BASE_URL,
+        flask_url=FLASK_URL,
+        marker_cookie=SESSION_MARKER_COOKIE,
+        rum_click_cookie=RUM_CLICK_COOKIE,
+    ))
+    response.headers["Cache-Control"] = f"public, max-age={LOGIN_SHELL_MAX_AGE}, stale-while-revalidate={LOGIN_SHELL_MAX_AGE}"
+    response.add_etag()
+    return response.make_conditional(request)
+
+# Replies of the login shell forms echo user input, so they must never be rendered as HTML
+def plain_text(body, status=200):
+    return body, status, {"Content-Type": "text/plain; charset=utf-8", "X-Content-Type-Options": "nosniff"}
+
+@app.route('/login/magic', methods=['POST'])
+@rate_limited
+def login_shell_magic():
+    email = request.form.get('email', '').strip()
+    if not email:
+        return plain_text("Please provide an email.", 400)
+    return plain_text(send_magic_link(email))
+
+@app.route('/login/sso', methods=['POST'])
+@rate_limited
+def login_shell_sso():
+    tenant_id = request.form.get('tenant_id', '').strip()
+    if not tenant_id:
+        return plain_text("Please provide a tenant ID.", 400)
+
+    flow_id = pending_flows.start("sso")
+    try:
+        sso_response = negative_cache.call(
+            "sso_tenant", tenant_id, descope_client.sso.start, tenant=tenant_id, return_url=f"{FLASK_URL}/verify-sso/{flow_id}"
+        )
+        return redirect(sso_response["url"])
+    except AuthException as error:
+        pending_flows.fail("sso", flow_id)
+        logger.error(f"Authentication failed: {error.error_message}")
+        return plain_text(f"Authentication Error: {error.error_message}", 400)
+    except Exception as e:
+        pending_flows.fail("sso", flow_id)
+        logger.error(f"Unexpected error during SSO flow: {str(e)}", exc_info=True)
+        return plain_text(f"Error: {str(e)}", 500)
+
+@app.route('/login/oauth', methods=['POST'])
+@rate_limited
+def login_shell_oauth():
+    flow_id = pending_flows.start("oauth")
+    try:
+        oauth_response = descope_client.oauth.start(provider="google", return_url=f"{FLASK_URL}/verify-oauth/{flow_id}")
+        return redirect(oauth_response["url"])
+    except AuthException as error:
+        pending_flows.fail("oauth", flow_id)
+        logger.error(f"Authentication failed: {error.error_message}")
+        return plain_text(f"Authentication Error: {error.error_message}", 400)
+    except Exception as e:
+        pending_flows.fail("oauth", flow_id)
+        logger.error(f"Unexpected error during OAuth flow: {str(e)}", exc_info=True)
+        return plain_text(f"Error: {str(e)}", 500)
+
+# Ends a cookie session (the cookie is HttpOnly, so the browser cannot clear it itself).
+# POST only: a link or image cannot log the user out, and the Lax cookie is not sent on cross-site POSTs
+@app.route('/logout', methods=['POST'])
+def cookie_session_logout():
+    session = read_cookie_session(request.cookies.get(SESSION_COOKIE))
+    if session:
+        shared_store.delete("cookie_session", session["session_id"])
+        profile_service.invalidate(token_subject(session["session_token"] or session["refresh_token"]))
+
+    response = redirect(f'{BASE_URL}/', code=303)
+    response.delete_cookie(SESSION_COOKIE)
+    return response
+
+# Batch token introspection for downstream services
+introspection_cache = ValidTokenCache()
+# Tokens with an unknown kid refresh the signing keys at most once per INTROSPECTION_KEY_REFRESH_INTERVAL
+introspection_keys = SigningKeyGate(lambda: (endpoint_router.local_client() if endpoint_router else descope_client)._auth)
+
+@app.route('/introspect', methods=['POST'])
+@service_token_required
+def introspect():
+    body = request.get_json(silent=True) or {}
+    tokens = body.get('tokens')
+
+    if not isinstance(tokens, list) or not all(isinstance(token, str) for token in tokens):
+        return jsonify(error="Body must be a JSON object with a list of token strings in 'tokens'"), 400
+    if len(tokens) > INTROSPECTION_MAX_BATCH:
+        return jsonify(error=f"At most {INTROSPECTION_MAX_BATCH} tokens per request"), 413
+
+    try:
+        results, unique_count = introspect_tokens(descope_client, tokens, introspection_cache, introspection_keys)
+    except SigningKeysUnavailable:
+        # The tokens may be genuine, so tell the caller to retry instead of rejecting them
+        response = jsonify(error="Signing keys unavailable, unable to validate tokens")
+        response.headers['Retry-After'] = str(max(1, int(INTROSPECTION_KEY_RETRY_INTERVAL)))
+        return response, 503
+    return jsonify(results=results, count=len(tokens), unique=unique_count)
+
+# Real-user timings of the login journey, beaconed by the browser
+rum_collector = RumCollector()
+rum_rate_limiter = RateLimiter(shared_store, "rum", limit=int(os.getenv("RUM_RATE_LIMIT", "60")), window=60)
+
+@app.route('/rum', methods=['POST'])
+def collect_rum():
+    if not rum_rate_limiter.hit(request.remote_addr):
+        return "", 429
+
+    # sendBeacon posts text/plain to avoid a CORS preflight
+    try:
+        events = json.loads(request.get_data(as_text=True) or "[]")
+    except ValueError:
+        return "", 400
+    if not isinstance(events, list):
+        return "", 400
+
+    rum_collector.record_batch(events)
+    return "", 204
+
+@app.route('/admin/rum', methods=['GET'])
+@admin_required
+def rum_summary():
+    return jsonify(rum_collector.summary())
+
+@app.route('/admin/concurrency', methods=['GET'])
+@admin_required
+def concurrency_stats():
+    return jsonify({group.name: group.stats() for group in (auth_upstream_group, auth_session_group)})
+
+@app.route('/admin/endpoints', methods=['GET'])
+@admin_required
+def endpoint_stats():
+    return jsonify(endpoint_router.stats() if endpoint_router else [])
+
+@app.route('/admin/sessions', methods=['GET'])
+@admin_required
+def session_stats():
+    return jsonify(session_registry.stats())
+
+@app.route('/admin/flows', methods=['GET'])
+@admin_required
+def flow_stats():
+    return jsonify(pending_flows.stats())
+
+@app.route('/admin/negative-cache', methods=['GET'])
+@admin_required
+def negative_cache_stats():
+    return jsonify(negative_cache.stats())
+
+@app.route('/admin/profile-cache', methods=['GET'])
+@admin_required
+def profile_cache_stats():
+    return jsonify(profile_service.stats())
+
+# Health check (also touches the shared store so a broken store is visible)
+@app.route('/healthz')
+def healthz():
+    shared_store.get("health", "ping")
+    return jsonify(status="ok", pid=os.getpid())
+
+# Admin endpoints to toggle profiling on a live instance
+@app.route('/admin/profile', methods=['GET'])
+@admin_required
+def profile_status():
+    return jsonify(profiling.profiling_status())
+
+@app.route('/admin/profile/sample', methods=['POST'])
+@admin_required
+def profile_sample():
+    seconds = request.args.get('seconds', default=30, type=float)
+    interval_ms = request.args.get('interval_ms', default=profiling.PROFILE_INTERVAL_MS, type=float)
+
+    if not profiling.start_sampler(seconds, interval_ms):
+        return jsonify(error="A sampler is already running"), 409
+
+    return jsonify(started=True, seconds=seconds, interval_ms=interval_ms)
+
+@app.route('/admin/profile/stop', methods=['POST'])
+@admin_required
+def profile_stop():
+    stopped = profiling.stop_sampler()
+    return jsonify(stopped=stopped, **profiling.profiling_status())
+
+@app.route('/admin/profile/rate', methods=['POST'])
+@admin_required
+def profile_rate():
+    try:
+        profiling.set_sample_rate(request.args.get('rate', default=0.0, type=float))
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(sample_rate=profiling.get_sample_rate())
+
+@app.route('/admin/profile/dump', methods=['POST'])
+@admin_required
+def profile_dump():
+    return jsonify(files=profiling.dump_handler_profiles())
+
+@profiled("get_token_and_update_state")
 def get_token_and_update_state(stored_state: gr.BrowserState, request: gr.Request):
+    track_session(request)
     try:
         query_params = dict(request.query_params)
         if query_params:
@@ -190,6 +609,17 @@ def get_token_and_update_state(stored_state: gr.BrowserState, request: gr.Reques
             session_token = query_params.get('session_token')
             refresh_token = query_params.get('refresh_token')
 
+            # Pick up the tokens left by the callback server (one-time use)
+            handoff_id = query_params.get('handoff')
+            if handoff_id:
+                handoff = shared_store.pop("handoff", handoff_id, default={})
+                auth_type = handoff.get('auth_type', auth_type)
+                session_token = handoff.get('session_token')
+                refresh_token = handoff.get('refresh_token')
+                origin_session = handoff.get('origin_session')
+                if origin_session and origin_session != request.session_hash:
+                    logger.info(f"Login started in session {origin_session} completed in session {request.session_hash}")
+
             if session_token:
                 stored_state[0] = session_token
                 stored_state[1] = refresh_token if refresh_token else ""
@@ -213,28 +643,93 @@ def create_login_page():
         
         with gr.Tab("Magic Link"):
             email = gr.Textbox(label="Enter your email")
-            magic_link_button = gr.Button("Send Magic Link")
+            magic_link_button = gr.Button("Send Magic Link", elem_id="magic-link-button")
             magic_link_message = gr.Textbox(label="Status", interactive=False)
             
         with gr.Tab("SSO"):
             tenant_input = gr.Textbox(label="Tenant ID", placeholder="Enter your Okta tenant ID")
-            sso_button = gr.Button("Start SSO Authentication")
+            sso_button = gr.Button("Start SSO Authentication", elem_id="sso-button")
             sso_message = gr.Textbox(label="Status", interactive=False)
             
         with gr.Tab("OAuth"):
             gr.Markdown("## Google OAuth Authentication")
-            oauth_button = gr.Button("Sign in with Google")
+            oauth_button = gr.Button("Sign in with Google", elem_id="oauth-button")
             oauth_message = gr.Textbox(label="Status", interactive=False)
             
     return login_page, email, magic_link_button, magic_link_message, tenant_input, sso_button, sso_message, oauth_button, oauth_message
 
-def create_main_page():
-    with gr.Column(visible=False) as main_page:
+def create_main_page(visible=False):
+    with gr.Column(visible=visible) as main_page:
         gr.Markdown("## Welcome to the Main Page")
         gr.Markdown("You have successfully logged in!")
+        with gr.Group():
+            profile_panel = gr.Markdown("Loading your profile...")
         gr.Textbox(label="Example Feature", value="This is the main application page")
         logout_button = gr.Button("Logout")
-    return main_page, logout_button
+    return main_page, profile_panel, logout_button
+
+# Function to validate the session, refreshing the session token once it has expired
+def resolve_session(session_token, refresh_token):
+    try:
+        claims = descope_client.validate_session(session_token)
+    except AuthException:
+        if not refresh_token:
+            raise
+        claims = descope_client.refresh_session(refresh_token)
+        # A refreshed session can carry new roles or tenants
+        profile_service.invalidate(claims["sessionToken"]["sub"])
+        refresh_token = claims.get("refreshSessionToken", {}).get("jwt") or refresh_token
+
+    return claims["sessionToken"]["sub"], claims["sessionToken"]["jwt"], refresh_token
+
+def format_profile(profile):
+    lines = [f"### {profile['name'] or profile['email'] or 'Your profile'}"]
+    if profile["email"]:
+        lines.append(f"**Email:** {profile['email']}")
+    if profile["roles"]:
+        lines.append(f"**Roles:** {', '.join(profile['roles'])}")
+    if profile["tenants"]:
+        tenants = "\n".join(
+            f"- {tenant['name']}" + (f" ({', '.join(tenant['roles'])})" if tenant["roles"] else "")
+            for tenant in profile["tenants"]
+        )
+        lines.append(f"**Tenants:**\n{tenants}")
+    return "\n\n".join(lines)
+
+# Function to render the profile panel; returns the (possibly refreshed) tokens too
+def render_profile(session_token, refresh_token):
+    try:
+        user_id, session_token, refresh_token = resolve_session(session_token, refresh_token)
+        return format_profile(profile_service.get(user_id, refresh_token)), session_token, refresh_token
+    except AuthException as e:
+        logger.error(f"Profile lookup failed: {e.error_message}")
+        return "Your session has expired. Please log out and sign in again.", session_token, refresh_token
+    except Exception as e:
+        logger.error(f"Unexpected error loading profile: {str(e)}", exc_info=True)
+        return "Your profile is not available right now.", session_token, refresh_token
+
+@profiled("load_profile")
+def load_profile(stored_state: gr.BrowserState):
+    if not stored_state[0]:
+        return gr.update(), stored_state
+    profile, stored_state[0], stored_state[1] = render_profile(stored_state[0], stored_state[1])
+    return profile, stored_state
+
+@profiled("load_cookie_profile")
+def load_cookie_profile(request: gr.Request):
+    track_session(request)
+    session = read_cookie_session(request.cookies.get(SESSION_COOKIE))
+    if not session:
+        return "Your session has expired. Please log out and sign in again."
+
+    profile, session_token, refresh_token = render_profile(session["session_token"], session["refresh_token"])
+    if session_token != session["session_token"]:
+        shared_store.set("cookie_session", session["session_id"], {
+            "auth_type": session["auth_type"],
+            "session_token": session_token,
+            "refresh_token": refresh_token,
+        }, ttl=COOKIE_SESSION_MAX_AGE)
+    return profile
 
 def load_stored_session(stored_state):
     if stored_state[0]:  # If session_token exists
@@ -252,7 +747,12 @@ def load_stored_session(stored_state):
         stored_state
     )
 
-def logout_user(stored_state: gr.BrowserState):
+def logout_user(stored_state: gr.BrowserState, request: gr.Request):
+    # Drop everything the server keeps for this tab and user. The tab stays open on the login page
+    session_registry.release(request.session_hash)
+    track_session(request)
+    profile_service.invalidate(token_subject(stored_state[0] or stored_state[1]))
+
     stored_state[0] = ""  # Clear session token
     stored_state[1] = ""  # Clear refresh token
     stored_state[2] = ""  # Clear auth type
@@ -264,53 +764,220 @@ def logout_user(stored_state: gr.BrowserState):
         stored_state
     )
 
+# Function to release server-side state when the tab is closed
+def release_session(request: gr.Request):
+    session_registry.release(request.session_hash)
+
+# Function run by the keepalive timer, so open tabs are not swept as idle
+def keep_session_alive(request: gr.Request):
+    track_session(request)
+
+# Keeps the session marker cookie in sync with the stored session token
+SET_SESSION_MARKER_JS = f"""
+(state) => {{
+    const value = state && state[0] ? "1" : "";
+    const maxAge = value ? 60 * 60 * 24 * 30 : 0;
+    document.cookie = "{SESSION_MARKER_COOKIE}=" + value + "; path=/; max-age=" + maxAge + "; samesite=lax";
+}}
+"""
+
+# Logs out of a cookie session with a form POST to the callback server, which clears the cookie
+COOKIE_LOGOUT_JS = f"""
+() => {{
+    const form = document.createElement("form");
+    form.method = "POST";
+    form.action = "{FLASK_URL}/logout";
+    document.body.appendChild(form);
+    form.submit();
+}}
+"""
+
+# Reports the login journey timings once the page has been rendered
+RUM_MAIN_VISIBLE_JS = """
+(state) => {
+    if (window.descopeRumMainVisible) window.descopeRumMainVisible(Boolean(state && state[0]));
+}
+"""
+
 def create_app():
-    with gr.Blocks() as app:
+    rum_head = rum_script(f"{FLASK_URL}/rum", {
+        "magic-link-button": "magic",
+        "sso-button": "sso",
+        "oauth-button": "oauth",
+    })
+
+    with gr.Blocks(head=rum_head) as app:
         # BrowserState stores [session_token, refresh_token, auth_type]
-        stored_state = gr.BrowserState(["", "", ""])
+        stored_state = gr.BrowserState(["", "", ""], storage_key="descope_session", secret=BROWSER_STATE_SECRET)
 
         # Create pages and components
         login_page, email, magic_link_button, magic_link_message, tenant_input, sso_button, sso_message, oauth_button, oauth_message = create_login_page()
-        main_page, logout_button = create_main_page()
+        main_page, profile_panel, logout_button = create_main_page()
 
         # Handle magic link authentication
         magic_link_button.click(
-            fn=send_magic_link,
+            fn=auth_upstream_group.wrap(send_magic_link),
             inputs=[email],
-            outputs=[magic_link_message]
+            outputs=[magic_link_message],
+            concurrency_limit=None,
+            concurrency_id=auth_upstream_group.name
         )
 
         # Handle SSO authentication
         sso_button.click(
-            fn=start_sso_flow,
+            fn=auth_upstream_group.wrap(start_sso_flow),
             inputs=[tenant_input],
-            outputs=[tenant_input, sso_message]
+            outputs=[tenant_input, sso_message],
+            concurrency_limit=None,
+            concurrency_id=auth_upstream_group.name
         )
 
         # Handle OAuth authentication
         oauth_button.click(
-            fn=start_oauth_flow,
+            fn=auth_upstream_group.wrap(start_oauth_flow),
             inputs=[],
-            outputs=[oauth_message]
+            outputs=[oauth_message],
+            concurrency_limit=None,
+            concurrency_id=auth_upstream_group.name
         )
 
         # Handle page load/refresh and token capture
         app.load(
-            fn=get_token_and_update_state,
+            fn=auth_session_group.wrap(get_token_and_update_state),
+            inputs=[stored_state],
+            outputs=[login_page, main_page, magic_link_message, stored_state],
+            concurrency_limit=None,
+            concurrency_id=auth_session_group.name
+        ).then(
+            fn=None,
+            inputs=[stored_state],
+            js=SET_SESSION_MARKER_JS
+        ).then(
+            fn=None,
             inputs=[stored_state],
-            outputs=[login_page, main_page, magic_link_message, stored_state]
+            js=RUM_MAIN_VISIBLE_JS
+        ).then(
+            fn=auth_upstream_group.wrap(load_profile),
+            inputs=[stored_state],
+            outputs=[profile_panel, stored_state],
+            concurrency_limit=None,
+            concurrency_id=auth_upstream_group.name
         )
 
         # Handle logout button click
         logout_button.click(
-            fn=logout_user,
+            fn=auth_session_group.wrap(logout_user),
+            inputs=[stored_state],
+            outputs=[login_page, main_page, magic_link_message, stored_state],
+            concurrency_limit=None,
+            concurrency_id=auth_session_group.name
+        ).then(
+            fn=None,
             inputs=[stored_state],
-            outputs=[login_page, main_page, magic_link_message, stored_state]
+            js=SET_SESSION_MARKER_JS
+        )
+
+        # Keep the session registered while the tab is open; release it when the tab is closed
+        gr.Timer(SESSION_KEEPALIVE_INTERVAL).tick(
+            fn=auth_session_group.wrap(keep_session_alive),
+            concurrency_limit=None,
+            concurrency_id=auth_session_group.name,
+            show_progress="hidden"
         )
+        app.unload(release_session)
+
+    # Product events on the main page use the default limit
+    app.queue(default_concurrency_limit=APP_CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE)
+    app.state_session_capacity = SESSION_STATE_CAPACITY
 
     return app
 
+# Main page only, for cookie sessions: it is visible in the initial config, so it renders without a load event
+def create_main_app():
+    with gr.Blocks(head=rum_script(f"{FLASK_URL}/rum", {})) as main_app:
+        main_page, profile_panel, logout_button = create_main_page(visible=True)
+
+        logout_button.click(fn=None, js=COOKIE_LOGOUT_JS)
+        main_app.load(fn=None, js="() => { if (window.descopeRumMainVisible) window.descopeRumMainVisible(true); }")
+
+        # The page is already shown; the profile panel fills in afterwards
+        main_app.load(
+            fn=auth_upstream_group.wrap(load_cookie_profile),
+            inputs=[],
+            outputs=[profile_panel],
+            concurrency_limit=None,
+            concurrency_id=auth_upstream_group.name
+        )
+
+        # Keep the session registered while the tab is open; release it when the tab is closed
+        gr.Timer(SESSION_KEEPALIVE_INTERVAL).tick(
+            fn=auth_session_group.wrap(keep_session_alive),
+            concurrency_limit=None,
+            concurrency_id=auth_session_group.name,
+            show_progress="hidden"
+        )
+        main_app.unload(release_session)
+
+    main_app.queue(default_concurrency_limit=APP_CONCURRENCY_LIMIT, max_size=QUEUE_MAX_SIZE)
+    main_app.state_session_capacity = SESSION_STATE_CAPACITY
+
+    return main_app
+
+# The Flask app as mounted under /admin on the UI server. Starlette moves the mount
+# prefix into SCRIPT_NAME, so it is put back for Flask's /admin/... routes
+def admin_wsgi_app(environ, start_response):
+    environ["PATH_INFO"] = environ.get("SCRIPT_NAME", "") + environ.get("PATH_INFO", "")
+    environ["SCRIPT_NAME"] = ""
+    return app(environ, start_response)
+
+# Function to serve the Gradio app from a FastAPI app (used by the login shell, cookie sessions and launcher.py)
+def create_ui_server():
+    from fastapi import FastAPI
+    from fastapi.responses import RedirectResponse
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+    server = FastAPI()
+
+    # The admin endpoints report on (and toggle profiling in) the process that serves them,
+    # so they are needed here too when the UI runs in its own workers (launcher.py)
+    server.mount("/admin", WSGIMiddleware(admin_wsgi_app))
+
+    @server.middleware("http")
+    async def route_by_session(request, call_next):
+        path = request.url.path.rstrip("/") or "/"
+        if request.method != "GET" or path not in ("/", MAIN_APP_PATH):
+            return await call_next(request)
+
+        if COOKIE_SESSION:
+            # Signed-in visitors get the main app, everyone else the login page
+            signed_in = read_cookie_session(request.cookies.get(SESSION_COOKIE)) is not None
+            if path == "/" and signed_in:
+                return RedirectResponse(f"{MAIN_APP_PATH}/")
+            if path == MAIN_APP_PATH and not signed_in:
+                return RedirectResponse(f"{FLASK_URL}/login" if LOGIN_SHELL else "/")
+            # The main app is mounted under MAIN_APP_PATH/ and does not answer without the slash
+            if request.url.path == MAIN_APP_PATH:
+                query = f"?{request.url.query}" if request.url.query else ""
+                return RedirectResponse(f"{MAIN_APP_PATH}/{query}")
+        else:
+            signed_in = SESSION_MARKER_COOKIE in request.cookies
+
+        # Visitors without a session or an auth callback never load the Gradio bundle
+        if LOGIN_SHELL and path == "/" and not request.query_params and not signed_in:
+            return RedirectResponse(f"{FLASK_URL}/login")
+        return await call_next(request)
+
+    # Mounted after /admin and before the root app, which would otherwise match every path
+    if COOKIE_SESSION:
+        gr.mount_gradio_app(server, create_main_app(), path=MAIN_APP_PATH)
+    return gr.mount_gradio_app(server, create_app(), path="")
+
 if __name__ == "__main__":
+    # Optionally sample the whole process from startup (PROFILE_SAMPLER_SECONDS=N)
+    sampler_seconds = float(os.getenv("PROFILE_SAMPLER_SECONDS", "0"))
+    if sampler_seconds > 0:
+        profiling.start_sampler(sampler_seconds)
+
     # Start Flask in a separate thread
     flask_thread = Thread(target=lambda: app.run(host="127.0.0.1", port=FLASK_PORT, debug=False, use_reloader=False))
     flask_thread.daemon = True
@@ -318,5 +985,9 @@ if __name__ == "__main__":
 
     # Start Gradio app
     logger.info("Starting Gradio interface")
-    gradio_app = create_app()
-    gradio_app.launch(server_name="127.0.0.1", server_port=GRADIO_PORT, share=False)
\ No newline at end of file
+    if LOGIN_SHELL or COOKIE_SESSION:
+        import uvicorn
+        uvicorn.run(create_ui_server(), host="127.0.0.1", port=GRADIO_PORT)
+    else:
+        gradio_app = create_app()
+        gradio_app.launch(server_name="127.0.0.1", server_port=GRADIO_PORT, share=False, state_session_capacity=SESSION_STATE_CAPACITY)
\ No newline at end of file
@@ -0,0 +1,247 @@
+import logging
+import os
+import threading
+import time
+
+import requests
+from descope import DescopeClient, AuthException, RateLimitException
+from descope.exceptions import ERROR_TYPE_SERVER_ERROR
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = float(os.getenv("ENDPOINT_EWMA_ALPHA", "0.3"))
+PROBE_INTERVAL = float(os.getenv("ENDPOINT_PROBE_INTERVAL", "30"))
+PROBE_TIMEOUT = float(os.getenv("ENDPOINT_PROBE_TIMEOUT", "5"))
+FAILURES_BEFORE_DOWN = 3
+DOWN_COOLDOWN = float(os.getenv("ENDPOINT_DOWN_COOLDOWN", "30"))
+ERROR_PENALTY = 10.0  # An endpoint failing every call scores 11x its latency
+
+# Client methods that check tokens locally against the cached signing keys. Their
+# timing says nothing about an endpoint, so they are not used as latency samples
+LOCAL_METHODS = {
+    "validate_session",
+    "validate_permissions",
+    "validate_roles",
+    "validate_tenant_permissions",
+    "validate_tenant_roles",
+    "get_matched_permissions",
+    "get_matched_roles",
+    "get_matched_tenant_permissions",
+    "get_matched_tenant_roles",
+}
+
+
+def create_descope_client(project_id, base_url):
+    """DescopeClient for a specific base URL"""
+    client = DescopeClient(project_id=project_id)
+    # The SDK only takes its base URL from DESCOPE_BASE_URI or the project region
+    client._auth.base_url = base_url.rstrip("/")
+    return client
+
+
+def is_transient_error(error):
+    """
+    Errors that count against an endpoint: network errors, timeouts, rate
+    limits and 5xx/408 responses. The SDK also raises AuthException(500) for
+    local token problems (bad header, unknown kid, empty token); those carry
+    another error type and say nothing about the endpoint
+    """
+    if isinstance(error, (requests.RequestException, RateLimitException)):
+        return True
+    if isinstance(error, AuthException) and error.error_type == ERROR_TYPE_SERVER_ERROR:
+        return error.status_code is not None and (error.status_code >= 500 or error.status_code == 408)
+    return False
+
+
+def can_fail_over(error):
+    """
+    Transient errors after which the call can be sent to another endpoint: the
+    request never got there (connection refused, connect timeout), or the
+    endpoint answered with a 5xx/408/429. Read timeouts and broken responses
+    may come after the endpoint acted on the request, and calls such as sending
+    a magic link or exchanging a code must not run twice
+    """
+    if isinstance(error, requests.RequestException):
+        # ConnectTimeout is a ConnectionError, ReadTimeout is not
+        return isinstance(error, requests.ConnectionError)
+    return is_transient_error(error)
+
+
+class Endpoint:
+    def __init__(self, url, client):
+        self.url = url
+        self.client = client
+        self.latency_ms = None  # EWMA of successful call and probe latency
+        self.error_rate = 0.0   # EWMA of transient failures (0 = healthy, 1 = always failing)
+        self.consecutive_failures = 0
+        self.down_until = 0.0
+        self.calls = 0
+        self.failures = 0
+
+    def healthy(self, now):
+        return self.down_until <= now
+
+    def score(self):
+        latency = self.latency_ms if self.latency_ms is not None else 0.0
+        return latency * (1 + ERROR_PENALTY * self.error_rate)
+
+
+class EndpointRouter:
+    """
+    Routes each call to the healthy endpoint with the best latency/error score
+    and fails over to the next one on transient errors. Scores come from live
+    traffic plus light background probes of every endpoint.
+    """
+
+    def __init__(self, urls, client_factory, probe_path="/", probe_interval=PROBE_INTERVAL, alpha=EWMA_ALPHA):
+        if not urls:
+            raise ValueError("At least one endpoint URL is required")
+        self.endpoints = [Endpoint(url, client_factory(url)) for url in urls]
+        self.probe_path = probe_path
+        self.probe_interval = probe_interval
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._prober_pid = None
+
+    def _record(self, endpoint, latency_ms=None, failed=False):
+        with self._lock:
+            if failed:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+                endpoint.error_rate += self.alpha * (1 - endpoint.error_rate)
+                if endpoint.consecutive_failures >= FAILURES_BEFORE_DOWN:
+                    endpoint.down_until = time.time() + DOWN_COOLDOWN
+                    logger.warning(f"Endpoint {endpoint.url} marked down for {DOWN_COOLDOWN}s")
+                return
+
+            endpoint.consecutive_failures = 0
+            endpoint.down_until = 0.0
+            endpoint.error_rate -= self.alpha * endpoint.error_rate
+            if latency_ms is not None:
+                if endpoint.latency_ms is None:
+                    endpoint.latency_ms = latency_ms
+                else:
+                    endpoint.latency_ms += self.alpha * (latency_ms - endpoint.latency_ms)
+
+    def ranked(self):
+        """Endpoints in the order they should be tried: healthy by score, then the rest"""
+        now = time.time()
+        with self._lock:
+            healthy = sorted((e for e in self.endpoints if e.healthy(now)), key=Endpoint.score)
+            down = sorted((e for e in self.endpoints if not e.healthy(now)), key=lambda e: e.down_until)
+        return healthy + down
+
+    def call(self, fn, measure=True):
+        """
+        Call fn(client) on the best endpoint, failing over when the request never
+        reached it or was refused with a 5xx/429. Other transient errors count
+        against the endpoint but are raised. With measure=False (local checks)
+        only transient failures are recorded
+        """
+        self._ensure_prober()
+        last_error = None
+        for endpoint in self.ranked():
+            with self._lock:
+                endpoint.calls += 1
+            start = time.perf_counter()
+            try:
+                result = fn(endpoint.client)
+            except Exception as e:
+                latency_ms = (time.perf_counter() - start) * 1000
+                if not is_transient_error(e):
+                    # The endpoint answered (or was never asked); the error is about the request itself
+                    if measure:
+                        self._record(endpoint, latency_ms)
+                    raise
+                self._record(endpoint, failed=True)
+                if not can_fail_over(e):
+                    # The endpoint may already have acted on the request
+                    logger.warning(f"Transient error from {endpoint.url}, not retrying: {e}")
+                    raise
+                logger.warning(f"Transient error from {endpoint.url}, failing over: {e}")
+                last_error = e
+                continue
+
+            if measure:
+                self._record(endpoint, (time.perf_counter() - start) * 1000)
+            return result
+        raise last_error
+
+    def local_client(self):
+        """Client of the best endpoint, for work done against its cached signing keys"""
+        return self.ranked()[0].client
+
+    def probe(self):
+        """Measure every endpoint once; any response below 500 means it is serving"""
+        for endpoint in self.endpoints:
+            start = time.perf_counter()
+            try:
+                response = requests.get(f"{endpoint.url.rstrip('/')}{self.probe_path}", timeout=PROBE_TIMEOUT)
+            except requests.RequestException as e:
+                logger.debug(f"Probe of {endpoint.url} failed: {e}")
+                self._record(endpoint, failed=True)
+                continue
+            if response.status_code >= 500:
+                self._record(endpoint, failed=True)
+                continue
+            self._record(endpoint, (time.perf_counter() - start) * 1000)
+
+    def _ensure_prober(self):
+        # Started lazily (and again after a fork) so every worker process probes for itself
+        if self.probe_interval <= 0 or self._prober_pid == os.getpid():
+            return
+        with self._lock:
+            if self._prober_pid == os.getpid():
+                return
+            self._prober_pid = os.getpid()
+        threading.Thread(target=self._probe_loop, name="endpoint-prober", daemon=True).start()
+
+    def _probe_loop(self):
+        while True:
+            self.probe()
+            time.sleep(self.probe_interval)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "url": e.url,
+                    "healthy": e.healthy(now),
+                    "latency_ms": round(e.latency_ms, 2) if e.latency_ms is not None else None,
+                    "error_rate": round(e.error_rate, 3),
+                    "score": round(e.score(), 2),
+                    "calls": e.calls,
+                    "failures": e.failures,
+                }
+                for e in self.endpoints
+            ]
+
+
+class _RoutedAttribute:
+    """Resolves attribute chains such as client.sso.start(...) on the routed endpoint"""
+
+    def __init__(self, router, path):
+        self._router = router
+        self._path = path
+
+    def __getattr__(self, name):
+        return _RoutedAttribute(self._router, self._path + [name])
+
+    def __call__(self, *args, **kwargs):
+        def invoke(client):
+            target = client
+            for name in self._path:
+                target = getattr(target, name)
+            return target(*args, **kwargs)
+        return self._router.call(invoke, measure=self._path[0] not in LOCAL_METHODS)
+
+
+class RoutedDescopeClient:
+    """Drop-in replacement for DescopeClient that spreads calls over several base URLs"""
+
+    def __init__(self, router):
+        self.router = router
+
+    def __getattr__(self, name):
+        return _RoutedAttribute(self.router, [name])
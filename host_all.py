@@ -0,0 +1,72 @@
+import logging
+import os
+
+import gradio as gr
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse
+from starlette.middleware.wsgi import WSGIMiddleware
+from werkzeug.exceptions import NotFound
+from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+logger = logging.getLogger(__name__)
+
+HOST_PORT = int(os.getenv("HOST_PORT", "8000"))
+HOST_URL = f"http://127.0.0.1:{HOST_PORT}"
+
+# Path prefix of each demo: the Gradio app is served under /<prefix>/ and its
+# callback endpoints under /auth/<prefix>/
+DEMO_PREFIXES = ["basic", "magic", "sso", "social", "descope"]
+
+
+def create_host_app():
+    """
+    Serve every demo app from one process and one port. The apps share one
+    DescopeClient (see descope_clients.py) and one callback router.
+    """
+    import basic_gradio_app
+
+    # Fork the hashing processes now, before the other apps and the server start threads
+    basic_gradio_app.credential_store.warm_up()
+
+    import magic_gradio_app
+    import sso_gradio_app
+    import social_gradio_app
+    import descope_gradio_app
+
+    callback_apps = {
+        "magic": magic_gradio_app.app,
+        "sso": sso_gradio_app.app_flask,
+        "social": social_gradio_app.app_flask,
+        "descope": descope_gradio_app.app,
+    }
+
+    # Point each app's redirect URLs at its prefix on this host
+    for prefix, module in [("magic", magic_gradio_app), ("sso", sso_gradio_app), ("social", social_gradio_app), ("descope", descope_gradio_app)]:
+        module.BASE_URL = f"{HOST_URL}/{prefix}"
+        module.FLASK_URL = f"{HOST_URL}/auth/{prefix}"
+
+    server = FastAPI()
+
+    # Callback router: one WSGI app dispatching to every demo's Flask routes
+    callbacks = DispatcherMiddleware(NotFound(), {f"/{prefix}": app for prefix, app in callback_apps.items()})
+    server.mount("/auth", WSGIMiddleware(callbacks))
+
+    @server.get("/", response_class=HTMLResponse)
+    def index():
+        links = "".join(f'<li><a href="/{prefix}/">{prefix}</a></li>' for prefix in DEMO_PREFIXES)
+        return f"<h1>Gradio Descope demos</h1><ul>{links}</ul>"
+
+    gr.mount_gradio_app(server, basic_gradio_app.app, path="/basic")
+    gr.mount_gradio_app(server, magic_gradio_app.create_app(), path="/magic")
+    gr.mount_gradio_app(server, sso_gradio_app.create_app(), path="/sso")
+    gr.mount_gradio_app(server, social_gradio_app.create_app(), path="/social")
+    gr.mount_gradio_app(server, descope_gradio_app.create_app(), path="/descope")
+
+    return server
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    logger.info(f"Serving all demos on {HOST_URL}")
+    uvicorn.run(create_host_app(), host="127.0.0.1", port=HOST_PORT)
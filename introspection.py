@@ -0,0 +1,156 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from descope import AuthException
+
+logger = logging.getLogger(__name__)
+
+INTROSPECTION_MAX_BATCH = int(os.getenv("INTROSPECTION_MAX_BATCH", "10000"))
+INTROSPECTION_CACHE_SIZE = int(os.getenv("INTROSPECTION_CACHE_SIZE", "100000"))
+# Least time between two signing key refreshes triggered by tokens with an unknown kid
+INTROSPECTION_KEY_REFRESH_INTERVAL = float(os.getenv("INTROSPECTION_KEY_REFRESH_INTERVAL", "60"))
+# Least time between two attempts after a signing key refresh failed
+INTROSPECTION_KEY_RETRY_INTERVAL = float(os.getenv("INTROSPECTION_KEY_RETRY_INTERVAL", "5"))
+
+# Claims already exposed at the top level of the response or not meant for other services
+_HIDDEN_CLAIMS = {"jwt", "sessionToken"}
+
+
+class ValidTokenCache:
+    """Bounded LRU of tokens that already passed validation, kept until they expire"""
+
+    def __init__(self, max_size=INTROSPECTION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()  # token -> (expires_at, result)
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[1]
+
+    def put(self, token, expires_at, result):
+        with self._lock:
+            self._entries[token] = (expires_at, result)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+
+class SigningKeysUnavailable(Exception):
+    """The signing keys could not be fetched, so tokens cannot be checked right now"""
+
+
+class SigningKeyGate:
+    """
+    Decides whether a token's kid is one of the cached signing keys. The SDK
+    fetches the keys again for every unknown kid, serialized under one lock
+    for the whole process, so unknown kids refresh the keys at most once per
+    refresh_interval and are otherwise answered without going upstream.
+    A failed refresh is retried at most once per retry_interval, and until
+    one succeeds known() raises SigningKeysUnavailable instead of calling
+    the kid unknown. get_auth() returns the SDK Auth object whose key cache is used.
+    """
+
+    def __init__(self, get_auth, refresh_interval=INTROSPECTION_KEY_REFRESH_INTERVAL, retry_interval=INTROSPECTION_KEY_RETRY_INTERVAL):
+        self.get_auth = get_auth
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self._last_refresh = None
+        self._last_failure = None
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
+
+    def known(self, kid):
+        auth = self.get_auth()
+        if kid in auth.public_keys:
+            return True
+
+        with self._lock:
+            # Another thread may have refreshed the keys while this one waited
+            if kid in auth.public_keys:
+                return True
+            now = time.monotonic()
+            if self._last_failure is not None and now - self._last_failure < self.retry_interval:
+                raise SigningKeysUnavailable()
+            if self._last_failure is None and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return False
+            try:
+                with auth.lock_public_keys:
+                    auth._fetch_public_keys()
+            except Exception as e:
+                self._last_failure = now
+                self.failures += 1
+                logger.error(f"Signing key refresh failed: {str(e)}")
+                raise SigningKeysUnavailable() from e
+            # Only a successful refresh starts the throttle
+            self._last_refresh = now
+            self._last_failure = None
+            self.refreshes += 1
+        return kid in auth.public_keys
+
+
+def token_kid(token):
+    try:
+        return jwt.get_unverified_header(token).get("kid")
+    except jwt.PyJWTError:
+        return None
+
+
+def introspect_token(descope_client, token, cache=None, keys=None):
+    """
+    Validate one session token locally against the cached signing keys.
+    Raises SigningKeysUnavailable if the keys needed to check it cannot be fetched
+    """
+    if cache is not None:
+        cached = cache.get(token)
+        if cached is not None:
+            return cached
+
+    if keys is not None:
+        kid = token_kid(token) if isinstance(token, str) else None
+        if not kid or not keys.known(kid):
+            return {"active": False, "error": "Unknown signing key"}
+
+    try:
+        # validate_session only calls Descope to fetch signing keys it has not seen yet
+        claims = descope_client.validate_session(token)
+    except AuthException as e:
+        return {"active": False, "error": e.error_message}
+    except Exception as e:
+        logger.error(f"Unexpected error during token introspection: {str(e)}")
+        return {"active": False, "error": "Unable to validate token"}
+
+    exp = claims.get("exp")
+    result = {
+        "active": True,
+        "sub": claims.get("sub"),
+        "exp": exp,
+        "claims": {k: v for k, v in claims.items() if k not in _HIDDEN_CLAIMS},
+    }
+    if cache is not None and exp:
+        cache.put(token, exp, result)
+    return result
+
+
+def introspect_tokens(descope_client, tokens, cache=None, keys=None):
+    """
+    Validate a batch of tokens. Each distinct token is validated once and
+    results are returned in the order of the input. Raises SigningKeysUnavailable
+    if the signing keys cannot be fetched
+    """
+    unique = {token: None for token in tokens}
+    for token in unique:
+        unique[token] = introspect_token(descope_client, token, cache, keys)
+    return [unique[token] for token in tokens], len(unique)
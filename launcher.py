@@ -0,0 +1,127 @@
+import argparse
+import logging
+import multiprocessing
+import os
+import secrets
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def create_listening_socket(host, port, reuse_port=False):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    return sock
+
+
+# Worker serving the Flask callback endpoints
+def run_callback_worker(sock, address):
+    from werkzeug.serving import make_server
+    import descope_gradio_app
+
+    if sock is None:
+        sock = create_listening_socket(*address, reuse_port=True)
+
+    server = make_server(address[0], address[1], descope_gradio_app.app, threaded=True, fd=sock.fileno())
+    logger.info(f"Callback worker {os.getpid()} serving on {address[0]}:{address[1]}")
+    server.serve_forever()
+
+
+# Worker serving the Gradio UI
+def run_ui_worker(sock, address):
+    import uvicorn
+    import descope_gradio_app
+
+    if sock is None:
+        sock = create_listening_socket(*address, reuse_port=True)
+
+    logger.info(f"UI worker {os.getpid()} serving on {address[0]}:{address[1]}")
+    config = uvicorn.Config(descope_gradio_app.create_ui_server(), log_level="warning")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host, callback_port, ui_port, workers, ui_workers, reuse_port=False):
+    """
+    Pre-fork master: binds the listening sockets once (or lets every worker
+    bind its own with SO_REUSEPORT), forks the workers and restarts any that die
+    """
+    # Every worker must encrypt BrowserState with the same secret
+    os.environ.setdefault("BROWSER_STATE_SECRET", secrets.token_urlsafe(32))
+
+    # Import the app once in the master so workers share it copy-on-write
+    import descope_gradio_app  # noqa: F401
+
+    if ui_workers > 1:
+        logger.warning(
+            "Gradio keeps its event queue in process memory, so more than one UI worker "
+            "needs a load balancer with sticky sessions in front of it"
+        )
+
+    specs = []
+    for _ in range(workers):
+        specs.append((run_callback_worker, (host, callback_port)))
+    for _ in range(ui_workers):
+        specs.append((run_ui_worker, (host, ui_port)))
+
+    sockets = {}
+    if not reuse_port:
+        if workers:
+            sockets[(host, callback_port)] = create_listening_socket(host, callback_port)
+        if ui_workers:
+            sockets[(host, ui_port)] = create_listening_socket(host, ui_port)
+
+    context = multiprocessing.get_context("fork")
+    processes = {}
+
+    def spawn(index):
+        target, address = specs[index]
+        process = context.Process(target=target, args=(sockets.get(address), address), daemon=True)
+        process.start()
+        processes[index] = process
+
+    for index in range(len(specs)):
+        spawn(index)
+
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    logger.info(f"Started {workers} callback workers on port {callback_port} and {ui_workers} UI workers on port {ui_port}")
+    while not stopping:
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping:
+                logger.warning(f"Worker {process.pid} exited with code {process.exitcode}, restarting")
+                spawn(index)
+        time.sleep(0.5)
+
+    logger.info("Shutting down workers")
+    for process in processes.values():
+        process.terminate()
+    for process in processes.values():
+        process.join(timeout=5)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Run the Descope Gradio app with several worker processes")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--callback-port", type=int, default=5000)
+    parser.add_argument("--ui-port", type=int, default=7860)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Number of callback server workers")
+    parser.add_argument("--ui-workers", type=int, default=1, help="Number of Gradio UI workers")
+    parser.add_argument("--reuse-port", action="store_true", help="Let every worker bind its own socket with SO_REUSEPORT")
+    args = parser.parse_args()
+
+    serve(args.host, args.callback_port, args.ui_port, args.workers, args.ui_workers, args.reuse_port)
@@ -1,6 +1,7 @@
 import gradio as gr
 from flask import Flask, request, redirect
-from descope import DescopeClient, DeliveryMethod, AuthException
+from descope import DeliveryMethod, AuthException
+from descope_clients import get_descope_client
 import os
 from dotenv import load_dotenv
 from threading import Thread
@@ -10,10 +11,16 @@ load_dotenv()
 
 # Descope Client Setup
 PROJECT_ID = os.getenv("PROJECT_ID")
-descope_client = DescopeClient(project_id=PROJECT_ID)
+descope_client = get_descope_client(PROJECT_ID)
 
 app = Flask(__name__)
 
+# Constants for URLs
+GRADIO_PORT = int(os.getenv("GRADIO_PORT", "7860"))
+FLASK_PORT = int(os.getenv("FLASK_PORT", "5000"))
+BASE_URL = f"http://127.0.0.1:{GRADIO_PORT}"
+FLASK_URL = f"http://127.0.0.1:{FLASK_PORT}"
+
 # Function to send the magic link
 def send_magic_link(email):
     try:
@@ -21,7 +28,7 @@ def send_magic_link(email):
         descope_client.magiclink.sign_up_or_in(
             method=DeliveryMethod.EMAIL,
             login_id=email,
-            uri="http://127.0.0.1:5000/verify"  # Redirect URI for Flask server
+            uri=f"{FLASK_URL}/verify"  # Redirect URI for Flask server
         )
         return f"Magic link sent to {email}! Please check your inbox."
     except Exception as e:
@@ -47,7 +54,7 @@ def verify_magic_link():
             raise AuthException("Failed to retrieve session token.")
 
         # Redirect to Gradio app with session token in URL
-        return redirect(f'http://127.0.0.1:7860/?token={session_token}')
+        return redirect(f'{BASE_URL}/?token={session_token}')
 
     except AuthException as e:
         return f"Authentication error: {str(e)}", 400
@@ -176,12 +183,12 @@ def create_app():
 # Function to run the Gradio app
 def run_gradio():
     gradio_app = create_app()
-    gradio_app.launch()
+    gradio_app.launch(server_name="127.0.0.1", server_port=GRADIO_PORT)
 
 if __name__ == "__main__":
     # Start Flask in a separate thread to handle /verify endpoint
     def run_flask():
-        app.run(host="127.0.0.1", port=5000, use_reloader=False)
+        app.run(host="127.0.0.1", port=FLASK_PORT, use_reloader=False)
 
     flask_thread = Thread(target=run_flask)
     flask_thread.start()
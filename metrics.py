@@ -0,0 +1,33 @@
+import threading
+from collections import deque
+
+# Number of most recent samples kept per series
+LATENCY_WINDOW = 2048
+
+
+class LatencyStats:
+    """Thread-safe window of recent latency samples with percentile summaries"""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._samples = deque(maxlen=window)
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def record(self, value):
+        with self._lock:
+            self._samples.append(value)
+            self._count += 1
+
+    def summary(self, percentiles=(50, 90, 95, 99)):
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self._count
+
+        result = {"count": count}
+        if not samples:
+            return result
+        for p in percentiles:
+            index = min(len(samples) - 1, int(round(p / 100 * (len(samples) - 1))))
+            result[f"p{p}"] = round(samples[index], 2)
+        result["max"] = round(samples[-1], 2)
+        return result
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from descope import AuthException
+
+logger = logging.getLogger(__name__)
+
+NEGATIVE_CACHE_TTL = float(os.getenv("NEGATIVE_CACHE_TTL", "60"))  # 0 disables the cache
+NEGATIVE_CACHE_SIZE = int(os.getenv("NEGATIVE_CACHE_SIZE", "10000"))
+
+# 4xx statuses that can succeed when retried
+TRANSIENT_STATUSES = {408, 425, 429}
+# Descope error codes to always treat as transient (or deterministic), whatever their status
+TRANSIENT_ERROR_CODES = {code.strip() for code in os.getenv("NEGATIVE_CACHE_TRANSIENT_CODES", "").split(",") if code.strip()}
+DETERMINISTIC_ERROR_CODES = {code.strip() for code in os.getenv("NEGATIVE_CACHE_DETERMINISTIC_CODES", "").split(",") if code.strip()}
+
+
+def error_code(error):
+    """Descope errorCode of an AuthException raised for an HTTP response, if any"""
+    try:
+        body = json.loads(error.error_message or "")
+    except (TypeError, ValueError):
+        return None
+    return body.get("errorCode") if isinstance(body, dict) else None
+
+
+def is_deterministic(error):
+    """
+    True if the same input will fail the same way again: client errors (4xx)
+    other than timeouts and rate limits, including the SDK's own argument
+    checks. Server errors and failures without a status are transient
+    """
+    code = error_code(error)
+    if code in TRANSIENT_ERROR_CODES:
+        return False
+    if code in DETERMINISTIC_ERROR_CODES:
+        return True
+    status = error.status_code
+    return isinstance(status, int) and 400 <= status < 500 and status not in TRANSIENT_STATUSES
+
+
+class NegativeCache:
+    """
+    Bounded LRU of deterministic Descope failures per (namespace, input),
+    so repeats of a bad tenant ID, email or used code are answered locally
+    for ttl seconds. Inputs are stored hashed.
+    """
+
+    def __init__(self, ttl=NEGATIVE_CACHE_TTL, max_size=NEGATIVE_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # (namespace, key hash) -> (expires_at, status, type, message)
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.stored = Counter()
+
+    @staticmethod
+    def _key(namespace, key):
+        return namespace, hashlib.sha256(str(key).encode()).hexdigest()
+
+    def get(self, namespace, key):
+        """Return a fresh AuthException for a remembered failure, or None"""
+        if self.ttl <= 0:
+            return None
+        entry_key = self._key(namespace, key)
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[entry_key]
+                entry = None
+            if entry is None:
+                self.misses[namespace] += 1
+                return None
+            self._entries.move_to_end(entry_key)
+            self.hits[namespace] += 1
+        return AuthException(*entry[1:])
+
+    def remember(self, namespace, key, error):
+        """Store error if it is deterministic. Returns whether it was stored"""
+        if self.ttl <= 0 or not is_deterministic(error):
+            return False
+        entry_key = self._key(namespace, key)
+        with self._lock:
+            self._entries[entry_key] = (time.monotonic() + self.ttl, error.status_code, error.error_type, error.error_message)
+            self._entries.move_to_end(entry_key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self.stored[namespace] += 1
+        return True
+
+    def call(self, namespace, key, fn, *args, **kwargs):
+        """Call fn unless key is known to fail in namespace; remember its deterministic failures"""
+        cached = self.get(namespace, key)
+        if cached is not None:
+            logger.debug(f"Answered {namespace} from the negative cache")
+            raise cached
+        try:
+            return fn(*args, **kwargs)
+        except AuthException as e:
+            self.remember(namespace, key, e)
+            raise
+
+    def stats(self):
+        with self._lock:
+            namespaces = sorted(set(self.hits) | set(self.misses) | set(self.stored))
+            per_namespace = {}
+            for namespace in namespaces:
+                lookups = self.hits[namespace] + self.misses[namespace]
+                per_namespace[namespace] = {
+                    "hits": self.hits[namespace],
+                    "misses": self.misses[namespace],
+                    "stored": self.stored[namespace],
+                    "hit_rate": self.hits[namespace] / lookups if lookups else 0.0,
+                }
+            return {"size": len(self._entries), "ttl": self.ttl, "namespaces": per_namespace}
@@ -0,0 +1,217 @@
+import logging
+import math
+import os
+import secrets
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# How long a started login may take before it counts as abandoned (seconds)
+FLOW_TTLS = {
+    "magic": float(os.getenv("MAGIC_FLOW_TTL", "900")),
+    "sso": float(os.getenv("SSO_FLOW_TTL", "600")),
+    "oauth": float(os.getenv("OAUTH_FLOW_TTL", "600")),
+}
+FLOW_TICK = float(os.getenv("FLOW_TICK", "1.0"))
+# Records stay in the shared store this long past their TTL, so the expiring process still finds them
+FLOW_GRACE = 60
+FLOW_COUNTER_TTL = 10 * 365 * 86400
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel. Every level has `slots` buckets; a bucket on
+    level n spans slots**n ticks. Timers are placed on the lowest level that
+    can hold them and cascade down as time approaches their expiry, so
+    schedule, cancel and expire are O(1) per timer.
+    """
+
+    def __init__(self, tick=1.0, slots=64, levels=4, now=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self.wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self.current = 0  # Ticks elapsed since start
+        self.start = time.monotonic() if now is None else now
+        self._where = {}  # key -> (level, slot)
+
+    def __len__(self):
+        return len(self._where)
+
+    def __contains__(self, key):
+        return key in self._where
+
+    def _place(self, key, expiry):
+        delta = max(expiry - self.current, 0)
+        for level in range(self.levels):
+            span = self.slots ** level
+            if delta < span * self.slots or level == self.levels - 1:
+                # Timers beyond the top level's range wait in its farthest bucket and are re-placed on cascade
+                bucket_tick = min(expiry, self.current + span * self.slots - 1)
+                slot = (bucket_tick // span) % self.slots
+                self.wheels[level][slot][key] = expiry
+                self._where[key] = (level, slot)
+                return
+
+    def schedule(self, key, delay):
+        """Expire key after delay seconds (replaces an existing timer for key)"""
+        self.cancel(key)
+        self._place(key, self.current + max(1, math.ceil(delay / self.tick)))
+
+    def cancel(self, key):
+        location = self._where.pop(key, None)
+        if location is None:
+            return False
+        level, slot = location
+        del self.wheels[level][slot][key]
+        return True
+
+    def advance(self, now=None):
+        """Move the wheel to now and return the keys that expired"""
+        now = time.monotonic() if now is None else now
+        target = int((now - self.start) / self.tick)
+        expired = []
+        while self.current < target:
+            self.current += 1
+
+            # Cascade higher levels whose bucket starts at this tick
+            for level in range(1, self.levels):
+                span = self.slots ** level
+                if self.current % span:
+                    break
+                slot = (self.current // span) % self.slots
+                bucket = self.wheels[level][slot]
+                self.wheels[level][slot] = {}
+                for key, expiry in bucket.items():
+                    self._place(key, expiry)
+
+            slot = self.current % self.slots
+            bucket = self.wheels[0][slot]
+            self.wheels[0][slot] = {}
+            for key, expiry in bucket.items():
+                if expiry <= self.current:
+                    del self._where[key]
+                    expired.append(key)
+                else:
+                    self._place(key, expiry)
+        return expired
+
+
+class PendingFlowRegistry:
+    """
+    Login attempts between the start call (magic link, SSO, OAuth) and the
+    matching callback, keyed by a flow ID carried in the callback URL.
+    Records and counters live in the shared store, because a flow started
+    in a UI worker is completed in a callback worker (see launcher.py).
+    Each process expires the flows it started with its own timing wheel.
+    Whichever process removes a record first (callback, failure or expiry)
+    is the one that counts it.
+    """
+
+    def __init__(self, store, ttls=FLOW_TTLS, tick=FLOW_TICK):
+        self.store = store
+        self.ttls = ttls
+        self._wheel = TimingWheel(tick=tick)
+        self._lock = threading.Lock()
+        self._ticker_pid = None
+
+    @staticmethod
+    def _namespace(method):
+        return f"flow:{method}"
+
+    def _ttl(self, method):
+        return self.ttls.get(method, 600)
+
+    def _count(self, name):
+        self.store.incr("flow_stats", name, FLOW_COUNTER_TTL)
+
+    def _cancel(self, method, flow_id):
+        # Only finds the timer in the process that started the flow; elsewhere
+        # the timer fires later and finds the record gone
+        with self._lock:
+            self._wheel.cancel((method, flow_id))
+
+    def start(self, method, session_hash=None):
+        """Register a new login attempt and return its flow ID"""
+        self._ensure_ticker()
+        flow_id = secrets.token_urlsafe(16)
+        ttl = self._ttl(method)
+        # The record outlives its timer by a grace period so the wheel always finds it
+        self.store.set(self._namespace(method), flow_id, {"session_hash": session_hash, "started_at": time.time()}, ttl=ttl + FLOW_GRACE)
+        with self._lock:
+            self._wheel.schedule((method, flow_id), ttl)
+        self._count(f"{method}:started")
+        return flow_id
+
+    def complete(self, method, flow_id):
+        """Match a successful callback to its attempt. Returns the flow record or None if unknown or expired"""
+        flow = self.store.pop(self._namespace(method), flow_id) if flow_id else None
+        if flow is None:
+            self._count("unknown_callbacks")
+            return None
+        self._cancel(method, flow_id)
+
+        duration = time.time() - flow["started_at"]
+        if duration > self._ttl(method):
+            # Arrived after the attempt was due to expire (its timer had not fired yet)
+            self._count(f"{method}:abandoned")
+            return None
+        self._count(f"{method}:completed")
+        return {"method": method, "session_hash": flow["session_hash"], "duration": duration}
+
+    def fail(self, method, flow_id):
+        """Drop an attempt whose start call or callback failed"""
+        flow = self.store.pop(self._namespace(method), flow_id) if flow_id else None
+        if flow is None:
+            self._count("unknown_callbacks")
+            return
+        self._cancel(method, flow_id)
+        self._count(f"{method}:failed")
+
+    def detach(self, method, flow_id):
+        """Forget the session that started a flow (its tab is gone) but keep the flow open"""
+        namespace = self._namespace(method)
+        flow = self.store.get(namespace, flow_id)
+        if flow is not None and flow["session_hash"] is not None:
+            self.store.replace(namespace, flow_id, dict(flow, session_hash=None))
+
+    def expire(self, now=None):
+        with self._lock:
+            expired = self._wheel.advance(now)
+        abandoned = 0
+        for method, flow_id in expired:
+            if self.store.pop(self._namespace(method), flow_id) is not None:
+                self._count(f"{method}:abandoned")
+                abandoned += 1
+        if abandoned:
+            logger.info(f"Expired {abandoned} abandoned login flows")
+        return abandoned
+
+    def _ensure_ticker(self):
+        # Started lazily (and again after a fork) so every worker process expires the flows it started
+        if self._ticker_pid == os.getpid():
+            return
+        with self._lock:
+            if self._ticker_pid == os.getpid():
+                return
+            self._ticker_pid = os.getpid()
+        threading.Thread(target=self._tick_loop, name="flow-expiry", daemon=True).start()
+
+    def _tick_loop(self):
+        while True:
+            time.sleep(self._wheel.tick)
+            try:
+                self.expire()
+            except Exception as e:
+                logger.error(f"Flow expiry failed: {e}")
+
+    def stats(self):
+        """Counts across all worker processes"""
+        result = {}
+        for method in sorted(self.ttls):
+            result[method] = {"in_flight": self.store.count(self._namespace(method))}
+            for event in ("started", "completed", "abandoned", "failed"):
+                result[method][event] = self.store.get("flow_stats", f"{method}:{event}", 0)
+        result["unknown_callbacks"] = self.store.get("flow_stats", "unknown_callbacks", 0)
+        return result
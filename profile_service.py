@@ -0,0 +1,137 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+
+logger = logging.getLogger(__name__)
+
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "300"))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", "10000"))
+
+
+def token_subject(token):
+    """
+    User ID (sub claim) of a token without verifying it. Only used to pick the
+    cache entry to drop on logout, never to decide what a caller may read.
+    """
+    try:
+        return jwt.decode(token, options={"verify_signature": False}).get("sub")
+    except jwt.PyJWTError:
+        return None
+
+
+def profile_from_user(user):
+    """The fields the profile panel shows, from a Descope user (me) response"""
+    tenants = [
+        {
+            "id": tenant.get("tenantId"),
+            "name": tenant.get("tenantName") or tenant.get("tenantId"),
+            "roles": tenant.get("roleNames") or [],
+        }
+        for tenant in user.get("userTenants") or []
+    ]
+    return {
+        "user_id": user.get("userId"),
+        "name": user.get("name") or "",
+        "email": user.get("email") or "",
+        "roles": user.get("roleNames") or [],
+        "tenants": tenants,
+    }
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ProfileService:
+    """
+    User profiles fetched from Descope once per user and kept in a bounded
+    TTL cache. Concurrent lookups for the same user share one upstream call.
+    fetch(refresh_token) returns the raw user details.
+    """
+
+    def __init__(self, fetch, ttl=PROFILE_CACHE_TTL, max_size=PROFILE_CACHE_SIZE):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # user_id -> (expires_at, profile)
+        self._inflight = {}  # user_id -> _Call
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+        self.shared = 0  # Lookups that waited on another caller's fetch
+        self.invalidations = 0
+
+    def get(self, user_id, refresh_token):
+        """Profile of a user whose session has already been validated"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            call = self._inflight.get(user_id)
+            leader = call is None
+            if leader:
+                call = self._inflight[user_id] = _Call()
+                self.fetches += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = profile_from_user(self.fetch(refresh_token))
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                # A fetch overtaken by invalidate() is handed to its waiters but not cached
+                if self._inflight.get(user_id) is call:
+                    del self._inflight[user_id]
+                    if call.error is None:
+                        self._entries[user_id] = (time.monotonic() + self.ttl, call.result)
+                        self._entries.move_to_end(user_id)
+                        while len(self._entries) > self.max_size:
+                            self._entries.popitem(last=False)
+            call.done.set()
+        return call.result
+
+    def invalidate(self, user_id):
+        """Drop a user's cached profile (on logout and token refresh)"""
+        if not user_id:
+            return
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._inflight.pop(user_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "fetches": self.fetches,
+                "shared": self.shared,
+                "invalidations": self.invalidations,
+            }
@@ -0,0 +1,231 @@
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Profiling settings (can be changed at runtime through the admin endpoints)
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "30"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+PROFILE_MAX_SECONDS = 600
+
+_state_lock = threading.Lock()
+_sample_rate = PROFILE_SAMPLE_RATE
+_handler_stats = {}      # handler name -> pstats.Stats
+_handler_calls = Counter()
+_active = threading.local()
+_sampler = None
+
+
+def _timestamp():
+    return time.strftime("%Y%m%d-%H%M%S")
+
+
+def _ensure_dir():
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return PROFILE_DIR
+
+
+class StackSampler(threading.Thread):
+    """
+    Low-overhead wall-clock sampler.
+    Periodically snapshots the stacks of all other threads and counts them
+    as collapsed stacks (frame;frame;frame count), the format read by
+    flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, seconds, interval_ms=PROFILE_INTERVAL_MS):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.seconds = min(float(seconds), PROFILE_MAX_SECONDS)
+        self.interval = max(float(interval_ms), 1.0) / 1000.0
+        self.stacks = Counter()
+        self.samples = 0
+        self.output_files = []
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        own_id = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + self.seconds
+        while not self._stop_event.is_set() and time.monotonic() < deadline:
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                self.stacks[self._collapse(names.get(thread_id, thread_id), frame)] += 1
+            self.samples += 1
+            self._stop_event.wait(self.interval)
+        self.output_files = self.dump()
+
+    @staticmethod
+    def _collapse(thread_name, frame):
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(str(thread_name))
+        return ";".join(reversed(frames))
+
+    def top(self, limit=PROFILE_TOP_N):
+        """Return (self samples, inclusive samples) tables for the busiest frames"""
+        self_counts = Counter()
+        inclusive_counts = Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")[1:]
+            if not frames:
+                continue
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                inclusive_counts[frame] += count
+        return self_counts.most_common(limit), inclusive_counts.most_common(limit)
+
+    def dump(self):
+        directory = _ensure_dir()
+        prefix = os.path.join(directory, f"sample-{_timestamp()}")
+
+        with open(f"{prefix}.collapsed", "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+        self_top, inclusive_top = self.top()
+        with open(f"{prefix}.top.txt", "w") as f:
+            f.write(f"{self.samples} samples every {self.interval * 1000:.1f}ms\n\n")
+            f.write("Top frames by self samples\n")
+            for frame, count in self_top:
+                f.write(f"{count:>8}  {frame}\n")
+            f.write("\nTop frames by inclusive samples\n")
+            for frame, count in inclusive_top:
+                f.write(f"{count:>8}  {frame}\n")
+
+        logger.info(f"Stack sampler wrote {prefix}.collapsed ({self.samples} samples)")
+        return [f"{prefix}.collapsed", f"{prefix}.top.txt"]
+
+
+def start_sampler(seconds, interval_ms=PROFILE_INTERVAL_MS):
+    """Start the stack sampler for N seconds. Returns False if one is already running"""
+    global _sampler
+    with _state_lock:
+        if _sampler is not None and _sampler.is_alive():
+            return False
+        _sampler = StackSampler(seconds, interval_ms)
+        _sampler.start()
+    logger.info(f"Stack sampler started for {_sampler.seconds}s")
+    return True
+
+
+def stop_sampler():
+    """Stop the running sampler early; it still writes its output"""
+    with _state_lock:
+        sampler = _sampler
+    if sampler is None or not sampler.is_alive():
+        return False
+    sampler.stop()
+    sampler.join()
+    return True
+
+
+def get_sample_rate():
+    return _sample_rate
+
+
+def set_sample_rate(rate):
+    """Set the fraction of handler calls that run under cProfile (0 disables)"""
+    global _sample_rate
+    rate = float(rate)
+    if not 0.0 <= rate <= 1.0:
+        raise ValueError("Sample rate must be between 0 and 1")
+    _sample_rate = rate
+    logger.info(f"Handler profiling sample rate set to {rate}")
+
+
+def profiled(name):
+    """
+    Decorator that runs a sampled fraction of calls to a handler under cProfile
+    and aggregates the results per handler name
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rate = _sample_rate
+            if rate <= 0 or getattr(_active, "profiling", False) or random.random() >= rate:
+                return fn(*args, **kwargs)
+
+            # cProfile only supports one active profiler per thread
+            _active.profiling = True
+            profiler = cProfile.Profile()
+            try:
+                return profiler.runcall(fn, *args, **kwargs)
+            finally:
+                _active.profiling = False
+                with _state_lock:
+                    if name in _handler_stats:
+                        _handler_stats[name].add(profiler)
+                    else:
+                        _handler_stats[name] = pstats.Stats(profiler)
+                    _handler_calls[name] += 1
+        return wrapper
+    return decorator
+
+
+def dump_handler_profiles(reset=True):
+    """
+    Write the aggregated per-handler profiles to disk: a .prof file
+    (readable by snakeviz, flameprof or gprof2dot) and a top-N table
+    """
+    with _state_lock:
+        stats = dict(_handler_stats)
+        calls = dict(_handler_calls)
+        if reset:
+            _handler_stats.clear()
+            _handler_calls.clear()
+
+    if not stats:
+        return []
+
+    directory = _ensure_dir()
+    timestamp = _timestamp()
+    written = []
+    for name, handler_stats in stats.items():
+        prefix = os.path.join(directory, f"{name}-{timestamp}")
+        handler_stats.dump_stats(f"{prefix}.prof")
+
+        buffer = io.StringIO()
+        handler_stats.stream = buffer
+        buffer.write(f"{name}: {calls.get(name, 0)} profiled calls\n")
+        handler_stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+        handler_stats.sort_stats("tottime").print_stats(PROFILE_TOP_N)
+        with open(f"{prefix}.top.txt", "w") as f:
+            f.write(buffer.getvalue())
+
+        written += [f"{prefix}.prof", f"{prefix}.top.txt"]
+
+    logger.info(f"Wrote handler profiles for {', '.join(stats)}")
+    return written
+
+
+def profiling_status():
+    with _state_lock:
+        sampler = _sampler
+        calls = dict(_handler_calls)
+    return {
+        "sample_rate": _sample_rate,
+        "profiled_calls": calls,
+        "sampler_running": bool(sampler and sampler.is_alive()),
+        "last_sampler_output": sampler.output_files if sampler else [],
+        "profile_dir": PROFILE_DIR,
+    }
@@ -0,0 +1,154 @@
+import threading
+
+from metrics import LatencyStats
+
+# Timings the browser reports for a login journey (milliseconds)
+RUM_METRICS = {
+    "idp_round_trip",     # Button click until the browser starts loading the Gradio app again
+    "document_response",  # Navigation start until the Gradio page document has arrived
+    "frontend_boot",      # Navigation start until the Gradio frontend has mounted
+    "load_round_trip",    # Frontend mounted until the app.load event has shown the page
+    "main_page_visible",  # Navigation start until the main page is visible
+    "login_total",        # Button click until the main page is visible
+}
+RUM_METHODS = {"magic", "sso", "oauth", "unknown"}
+RUM_MAX_BATCH = 50
+RUM_MAX_VALUE_MS = 15 * 60 * 1000
+
+# Cookie holding "<auth method>:<click time>" (cookies are shared between the
+# Gradio and callback server ports, localStorage is not)
+RUM_CLICK_COOKIE = "descope_rum_click"
+
+
+class RumCollector:
+    """Aggregates real-user timings per auth method and metric"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record_batch(self, events):
+        """Record a batch of {method, metric, value} events, returns how many were accepted"""
+        accepted = 0
+        for event in events[:RUM_MAX_BATCH]:
+            if not isinstance(event, dict):
+                continue
+            method = event.get("method")
+            if not isinstance(method, str) or method not in RUM_METHODS:
+                method = "unknown"
+            metric = event.get("metric")
+            value = event.get("value")
+            # Lists and dicts are unhashable and bools pass as ints, so check the types first
+            if not isinstance(metric, str) or metric not in RUM_METRICS:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if not 0 <= value <= RUM_MAX_VALUE_MS:
+                continue
+
+            with self._lock:
+                stats = self._stats.setdefault((method, metric), LatencyStats())
+            stats.record(value)
+            accepted += 1
+        return accepted
+
+    def summary(self):
+        with self._lock:
+            items = list(self._stats.items())
+
+        result = {}
+        for (method, metric), stats in sorted(items):
+            result.setdefault(method, {})[metric] = stats.summary()
+        return result
+
+
+def rum_script(endpoint, button_methods):
+    """
+    Browser script that records the login journey and beacons it to the endpoint.
+    button_methods maps button elem_ids to auth methods.
+    """
+    buttons = ", ".join(f'"{elem_id}": "{method}"' for elem_id, method in button_methods.items())
+    return f"""
+<script>
+(() => {{
+    const ENDPOINT = "{endpoint}";
+    const CLICK_COOKIE = "{RUM_CLICK_COOKIE}";
+    const BUTTONS = {{{buttons}}};
+    const queue = [];
+    let bootTime = null;
+
+    window.descopeRumClick = (method) => {{
+        document.cookie = CLICK_COOKIE + "=" + encodeURIComponent(method + ":" + Date.now()) + "; path=/; max-age=3600; samesite=lax";
+    }};
+
+    function readClick() {{
+        const match = document.cookie.match(new RegExp("(?:^|; )" + CLICK_COOKIE + "=([^;]*)"));
+        if (!match) return null;
+        const [method, time] = decodeURIComponent(match[1]).split(":");
+        document.cookie = CLICK_COOKIE + "=; path=/; max-age=0";
+        return {{ method, time: Number(time) }};
+    }}
+
+    function push(method, metric, value) {{
+        if (Number.isFinite(value) && value >= 0) queue.push({{ method, metric, value: Math.round(value) }});
+    }}
+
+    function flush() {{
+        if (!queue.length) return;
+        const body = JSON.stringify(queue.splice(0));
+        if (!(navigator.sendBeacon && navigator.sendBeacon(ENDPOINT, body))) {{
+            fetch(ENDPOINT, {{ method: "POST", body, keepalive: true, mode: "no-cors" }});
+        }}
+    }}
+
+    // Remember which auth button was clicked and when
+    document.addEventListener("click", (event) => {{
+        for (const id in BUTTONS) {{
+            if (event.target.closest && event.target.closest("#" + id)) window.descopeRumClick(BUTTONS[id]);
+        }}
+    }}, true);
+
+    // Frontend boot: the first time the Gradio container is in the page
+    const observer = new MutationObserver(() => {{
+        if (document.querySelector(".gradio-container")) {{
+            bootTime = performance.now();
+            observer.disconnect();
+        }}
+    }});
+    observer.observe(document.documentElement, {{ childList: true, subtree: true }});
+
+    // Called once app.load has rendered the page
+    window.descopeRumMainVisible = (loggedIn) => {{
+        const params = new URLSearchParams(window.location.search);
+        if (!loggedIn || !params.has("auth_type")) return;  // Only report returns from a login
+
+        const now = performance.now();
+        const click = readClick();
+        const method = params.get("auth_type") || (click && click.method) || "unknown";
+        const navigation = performance.getEntriesByType("navigation")[0];
+
+        // Reloads of this page are not logins: drop the one-time parameters from the URL
+        params.delete("auth_type");
+        params.delete("handoff");
+        const query = params.toString();
+        history.replaceState(history.state, "", window.location.pathname + (query ? "?" + query : "") + window.location.hash);
+
+        if (click) {{
+            push(method, "idp_round_trip", performance.timeOrigin - click.time);
+            push(method, "login_total", performance.timeOrigin + now - click.time);
+        }}
+        if (navigation) push(method, "document_response", navigation.responseEnd);
+        if (bootTime !== null) {{
+            push(method, "frontend_boot", bootTime);
+            push(method, "load_round_trip", now - bootTime);
+        }}
+        push(method, "main_page_visible", now);
+        flush();
+    }};
+
+    document.addEventListener("visibilitychange", () => {{
+        if (document.visibilityState === "hidden") flush();
+    }});
+}})();
+</script>
+"""
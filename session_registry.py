@@ -0,0 +1,112 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "1800"))
+SESSION_SWEEP_INTERVAL = float(os.getenv("SESSION_SWEEP_INTERVAL", "60"))
+# How often an open tab tells the server it is still there (well below SESSION_IDLE_TTL)
+SESSION_KEEPALIVE_INTERVAL = float(os.getenv("SESSION_KEEPALIVE_INTERVAL", str(min(SESSION_IDLE_TTL / 3, 300))))
+
+
+class _Session:
+    __slots__ = ("last_seen", "cleanups")
+
+    def __init__(self, now):
+        self.last_seen = now
+        self.cleanups = []
+
+
+class SessionRegistry:
+    """
+    Server-side state tied to a Gradio session (keyed by session_hash).
+    Sessions are released when the tab unloads or, for tabs that never send
+    an unload, by a periodic sweep once they have been idle for idle_ttl.
+    Open tabs stay registered by touching their session on every event,
+    including a keepalive timer. Releasing a session runs every cleanup
+    callback registered for it.
+    """
+
+    def __init__(self, idle_ttl=SESSION_IDLE_TTL, sweep_interval=SESSION_SWEEP_INTERVAL):
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._sweeper_pid = None
+        self.released = 0
+        self.swept = 0
+
+    def touch(self, session_hash):
+        """Mark a session as active. Returns True if it was not registered yet"""
+        self._ensure_sweeper()
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_hash)
+            if session is not None:
+                session.last_seen = now
+                return False
+            self._sessions[session_hash] = _Session(now)
+            return True
+
+    def on_release(self, session_hash, callback):
+        """Run callback() when the session is released"""
+        with self._lock:
+            session = self._sessions.get(session_hash)
+            if session is None:
+                session = self._sessions[session_hash] = _Session(time.monotonic())
+            session.cleanups.append(callback)
+
+    def release(self, session_hash):
+        with self._lock:
+            session = self._sessions.pop(session_hash, None)
+            if session is None:
+                return False
+            self.released += 1
+
+        for callback in session.cleanups:
+            try:
+                callback()
+            except Exception as e:
+                logger.error(f"Session cleanup failed for {session_hash}: {e}")
+        return True
+
+    def sweep(self):
+        """Release every session idle for longer than idle_ttl"""
+        cutoff = time.monotonic() - self.idle_ttl
+        with self._lock:
+            idle = [session_hash for session_hash, session in self._sessions.items() if session.last_seen < cutoff]
+        for session_hash in idle:
+            if self.release(session_hash):
+                self.swept += 1
+        if idle:
+            logger.info(f"Released {len(idle)} idle sessions")
+        return len(idle)
+
+    def _ensure_sweeper(self):
+        # Started lazily (and again after a fork) so every worker process sweeps its own sessions
+        if self.sweep_interval <= 0 or self._sweeper_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sweeper_pid == os.getpid():
+                return
+            self._sweeper_pid = os.getpid()
+        threading.Thread(target=self._sweep_loop, name="session-sweeper", daemon=True).start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Session sweep failed: {e}")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            active = len(self._sessions)
+        return {"active": active, "released": self.released, "swept": self.swept, "idle_ttl": self.idle_ttl}
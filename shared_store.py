@@ -0,0 +1,165 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# SQLite file shared by every worker process on the box
+SHARED_STORE_PATH = os.getenv("SHARED_STORE_PATH", "shared_state.sqlite3")
+# How often expired keys are deleted (0 disables the purge)
+SHARED_STORE_PURGE_INTERVAL = float(os.getenv("SHARED_STORE_PURGE_INTERVAL", "300"))
+
+
+class SharedStore:
+    """
+    Small key/value store with expiry, backed by SQLite in WAL mode so that
+    several worker processes can share handoff, session and rate-limit state.
+    Keys live in namespaces and values are stored as JSON. Expired keys are
+    deleted by a periodic purge.
+    """
+
+    def __init__(self, path=SHARED_STORE_PATH, purge_interval=SHARED_STORE_PURGE_INTERVAL):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._purger_pid = None
+        conn = self._connection()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS kv (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            ) WITHOUT ROWID
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS kv_expires_at ON kv (expires_at)")
+
+    def _connection(self):
+        # One connection per thread and per process (connections must not cross a fork)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def set(self, namespace, key, value, ttl):
+        self._ensure_purger()
+        self._connection().execute(
+            "INSERT OR REPLACE INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value), time.time() + ttl),
+        )
+
+    def get(self, namespace, key, default=None):
+        row = self._connection().execute(
+            "SELECT value FROM kv WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def pop(self, namespace, key, default=None):
+        """Atomically read and delete a key (used for one-time handoffs)"""
+        row = self._connection().execute(
+            "DELETE FROM kv WHERE namespace = ? AND key = ? RETURNING value, expires_at",
+            (namespace, key),
+        ).fetchone()
+        if not row or row[1] <= time.time():
+            return default
+        return json.loads(row[0])
+
+    def delete(self, namespace, key):
+        self._connection().execute(
+            "DELETE FROM kv WHERE namespace = ? AND key = ?", (namespace, key)
+        )
+
+    def replace(self, namespace, key, value):
+        """Overwrite the value of a live key, keeping its expiry. Returns False if the key is gone"""
+        cursor = self._connection().execute(
+            "UPDATE kv SET value = ? WHERE namespace = ? AND key = ? AND expires_at > ?",
+            (json.dumps(value), namespace, key, time.time()),
+        )
+        return cursor.rowcount > 0
+
+    def count(self, namespace):
+        """Number of live keys in a namespace"""
+        row = self._connection().execute(
+            "SELECT COUNT(*) FROM kv WHERE namespace = ? AND expires_at > ?", (namespace, time.time())
+        ).fetchone()
+        return row[0]
+
+    def incr(self, namespace, key, ttl):
+        """Increment a counter, starting a new one if it is missing or expired"""
+        self._ensure_purger()
+        now = time.time()
+        row = self._connection().execute(
+            """
+            INSERT INTO kv (namespace, key, value, expires_at) VALUES (?, ?, '1', ?)
+            ON CONFLICT (namespace, key) DO UPDATE SET
+                value = CASE WHEN expires_at <= ? THEN '1' ELSE CAST(value AS INTEGER) + 1 END,
+                expires_at = CASE WHEN expires_at <= ? THEN excluded.expires_at ELSE expires_at END
+            RETURNING value
+            """,
+            (namespace, key, now + ttl, now, now),
+        ).fetchone()
+        return int(row[0])
+
+    def purge_expired(self):
+        cursor = self._connection().execute(
+            "DELETE FROM kv WHERE expires_at <= ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+    def _ensure_purger(self):
+        # Started lazily (and again after a fork) so the store is purged while any worker writes to it
+        if self.purge_interval <= 0 or self._purger_pid == os.getpid():
+            return
+        with self._lock:
+            if self._purger_pid == os.getpid():
+                return
+            self._purger_pid = os.getpid()
+        threading.Thread(target=self._purge_loop, name="shared-store-purger", daemon=True).start()
+
+    def _purge_loop(self):
+        while True:
+            time.sleep(self.purge_interval)
+            try:
+                purged = self.purge_expired()
+            except sqlite3.Error as e:
+                logger.error(f"Shared store purge failed: {e}")
+                continue
+            if purged:
+                logger.info(f"Purged {purged} expired keys from the shared store")
+
+
+class RateLimiter:
+    """
+    Fixed-window rate limiter whose counters live in the shared store. Each
+    key has one counter; its window starts at the first hit and the counter
+    restarts once the window has expired.
+    """
+
+    def __init__(self, store, namespace, limit, window):
+        self.store = store
+        self.namespace = namespace
+        self.limit = limit
+        self.window = window
+
+    def hit(self, key):
+        """Count a request for key and return True if it is within the limit"""
+        if self.limit <= 0:
+            return True
+        count = self.store.incr(self.namespace, key, self.window)
+        if count > self.limit:
+            logger.warning(f"Rate limit exceeded for {self.namespace}:{key}")
+            return False
+        return True
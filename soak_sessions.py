@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from shared_store import SharedStore
+
+ADMIN_TOKEN = secrets.token_hex(16)
+
+# Runs the UI server of descope_gradio_app.py (Gradio plus /admin) in a child process
+SERVER_CODE = """
+import sys
+import uvicorn
+import descope_gradio_app
+uvicorn.run(descope_gradio_app.create_ui_server(), host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
+"""
+
+
+def start_server(port, idle_ttl, sweep_interval, state_capacity, store_path):
+    env = dict(
+        os.environ,
+        PROJECT_ID="P" + "0" * 31,
+        ADMIN_TOKEN=ADMIN_TOKEN,
+        SHARED_STORE_PATH=store_path,
+        SESSION_IDLE_TTL=str(idle_ttl),
+        SESSION_SWEEP_INTERVAL=str(sweep_interval),
+        SESSION_STATE_CAPACITY=str(state_capacity),
+        GRADIO_ANALYTICS_ENABLED="False",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-c", SERVER_CODE, str(port)],
+        env=env,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            if requests.get(f"{base_url}/config", timeout=1).ok:
+                return server, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    server.kill()
+    raise RuntimeError("Server did not start within 60s")
+
+
+def server_rss_mb(server):
+    with open(f"/proc/{server.pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def admin_sessions(base_url):
+    response = requests.get(f"{base_url}/admin/sessions", headers={"X-Admin-Token": ADMIN_TOKEN}, timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+def event_indices(base_url):
+    """fn_index and trigger id of every backend event, by function name"""
+    config = requests.get(f"{base_url}/config", timeout=10).json()
+    return {
+        dependency["api_name"]: (dependency["id"], dependency["targets"][0][0])
+        for dependency in config["dependencies"]
+        if dependency.get("backend_fn")
+    }
+
+
+class Tab:
+    """One browser tab talking to Gradio the way the frontend does: a heartbeat stream plus queued events"""
+
+    def __init__(self, base_url, events, query=""):
+        self.base_url = base_url
+        self.events = events
+        self.query = query
+        self.session_hash = secrets.token_hex(6)
+        self.http = requests.Session()
+        self.heartbeat = None
+        self._heartbeat_lines = None
+
+    def open_heartbeat(self):
+        self.heartbeat = self.http.get(f"{self.base_url}/gradio_api/heartbeat/{self.session_hash}", stream=True, timeout=30)
+        # The server has registered the connection once it has sent ALIVE. The line iterator is kept,
+        # because discarding it closes the connection
+        self._heartbeat_lines = self.heartbeat.iter_lines()
+        next(self._heartbeat_lines)
+
+    def close(self):
+        """Drop the heartbeat connection, which makes Gradio run the unload event"""
+        if self.heartbeat is not None:
+            self.heartbeat.close()
+            self.heartbeat = self._heartbeat_lines = None
+        self.http.close()
+
+    def run(self, name, data):
+        fn_index, trigger_id = self.events[name]
+        url = f"{self.base_url}/gradio_api/queue/join"
+        if self.query:
+            url += f"?{self.query}"
+        joined = self.http.post(url, json={
+            "data": data,
+            "event_data": None,
+            "fn_index": fn_index,
+            "trigger_id": trigger_id,
+            "session_hash": self.session_hash,
+        }, timeout=30)
+        joined.raise_for_status()
+        event_id = joined.json()["event_id"]
+
+        message = None
+        with self.http.get(f"{self.base_url}/gradio_api/queue/data", params={"session_hash": self.session_hash}, stream=True, timeout=60) as stream:
+            for line in stream.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                message = json.loads(line[5:])
+                if message.get("event_id") == event_id and message.get("msg") == "process_completed":
+                    if not message.get("success"):
+                        raise RuntimeError(f"{name} failed: {message.get('output')}")
+                    return message["output"]["data"]
+        raise RuntimeError(f"{name} did not complete (last message: {message})")
+
+
+# Function to simulate one browser tab opening the app and going away
+def simulate_session(base_url, events, store, close_ratio, logout_ratio, sso_ratio):
+    query = ""
+    # Half of the tabs arrive from a login callback with a session handoff
+    if random.random() < 0.5:
+        handoff_id = secrets.token_urlsafe(32)
+        store.set("handoff", handoff_id, {
+            "auth_type": "sso",
+            "session_token": secrets.token_urlsafe(300),
+            "refresh_token": secrets.token_urlsafe(300),
+        }, ttl=60)
+        query = f"auth_type=sso&handoff={handoff_id}"
+
+    tab = Tab(base_url, events, query)
+    outcome = random.random()
+    abandoned = outcome >= logout_ratio + close_ratio
+    try:
+        # Abandoned tabs never keep a heartbeat, so Gradio never unloads them and only the idle sweep can
+        if not abandoned:
+            tab.open_heartbeat()
+        stored_state = tab.run("get_token_and_update_state", [["", "", ""]])[3]
+        if random.random() < sso_ratio:
+            # Registers a pending flow and its release cleanup for this tab
+            tab.run("start_sso_flow", ["soak-tenant"])
+        if outcome < logout_ratio:
+            tab.run("logout_user", [stored_state])
+    finally:
+        tab.close()
+    return "abandoned" if abandoned else "closed"
+
+
+# Function to keep tabs open for the whole run, ticking their keepalive timer like the browser does
+def keep_tabs_open(tabs, interval, stop):
+    while not stop.wait(interval):
+        for tab in tabs:
+            tab.run("keep_session_alive", [])
+
+
+def wait_for_active(base_url, expected, timeout):
+    deadline = time.time() + timeout
+    stats = admin_sessions(base_url)
+    while stats["active"] != expected and time.time() < deadline:
+        time.sleep(0.5)
+        stats = admin_sessions(base_url)
+    return stats
+
+
+def run(args):
+    store_path = os.path.join(tempfile.mkdtemp(), "soak.sqlite3")
+    store = SharedStore(store_path)
+    server, base_url = start_server(args.port, args.idle_ttl, args.sweep_interval, args.state_capacity, store_path)
+    stop = threading.Event()
+    try:
+        events = event_indices(base_url)
+
+        active_tabs = [Tab(base_url, events) for _ in range(args.active_tabs)]
+        for tab in active_tabs:
+            tab.open_heartbeat()
+            tab.run("get_token_and_update_state", [["", "", ""]])
+        keepalive = threading.Thread(target=keep_tabs_open, args=(active_tabs, args.idle_ttl / 3, stop), daemon=True)
+        keepalive.start()
+
+        # Every sweep has had a chance to run once an abandoned session is idle_ttl plus two sweeps old
+        settle = args.idle_ttl + 2 * args.sweep_interval
+        samples = []
+        abandoned = 0
+        for round_number in range(1, args.rounds + 1):
+            start = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                outcomes = list(pool.map(
+                    lambda _: simulate_session(base_url, events, store, args.close_ratio, args.logout_ratio, args.sso_ratio),
+                    range(args.sessions),
+                ))
+            elapsed = time.perf_counter() - start
+            abandoned += outcomes.count("abandoned")
+            open_after_round = admin_sessions(base_url)["active"]
+
+            start = time.perf_counter()
+            stats = wait_for_active(base_url, len(active_tabs), settle + args.sweep_interval)
+            samples.append(server_rss_mb(server))
+            print(
+                f"round {round_number:>3}: {args.sessions} sessions in {elapsed:.1f}s, "
+                f"{outcomes.count('abandoned')} abandoned, {open_after_round} open after the round, "
+                f"{stats['active']} after {time.perf_counter() - start:.0f}s, server RSS {samples[-1]:.1f} MiB"
+            )
+            assert stats["active"] == len(active_tabs), (
+                f"{stats['active']} sessions registered after the sweep, expected the {len(active_tabs)} open tabs"
+            )
+            # An open tab that was swept would be registered again by its next keepalive, so count sweeps too
+            assert stats["swept"] == abandoned, f"{stats['swept']} sessions swept, but only {abandoned} tabs were abandoned"
+
+        # The open tabs have outlived idle_ttl many times over; closing them releases them through unload
+        stop.set()
+        keepalive.join()
+        for tab in active_tabs:
+            tab.close()
+        # Gradio notices a dropped heartbeat at its next 15s tick
+        stats = wait_for_active(base_url, 0, 20)
+        print(f"\nRegistry after closing the open tabs: {stats}")
+        assert stats["active"] == 0, f"{stats['active']} sessions left after every tab was closed"
+
+        # The first round warms up caches and allocator pools and fills Gradio's per-session
+        # state up to --state-capacity, so measure growth after it
+        growth = samples[-1] - samples[0]
+        per_session_kb = growth * 1024 / (args.sessions * (args.rounds - 1))
+        print(
+            f"{args.sessions * args.rounds} sessions, server RSS growth after warm-up: "
+            f"{growth:.1f} MiB ({per_session_kb:.1f} KiB per session)"
+        )
+        assert per_session_kb <= args.max_growth_kb, (
+            f"RSS grew by {per_session_kb:.1f} KiB per session (limit {args.max_growth_kb} KiB)"
+        )
+        print("OK: open tabs were kept, closed and abandoned ones released, RSS growth within the limit")
+    finally:
+        stop.set()
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soak test: open, close and abandon many real Gradio sessions and check that memory stays flat")
+    parser.add_argument("--sessions", type=int, default=1000, help="Sessions per round")
+    parser.add_argument("--rounds", type=int, default=6, help="Rounds, the first of which is a warm-up (at least 2)")
+    parser.add_argument("--active-tabs", type=int, default=20, help="Tabs kept open (with keepalive) for the whole run")
+    parser.add_argument("--close-ratio", type=float, default=0.4, help="Fraction of tabs that close normally (unload)")
+    parser.add_argument("--logout-ratio", type=float, default=0.2, help="Fraction of tabs that log out and then close")
+    parser.add_argument("--sso-ratio", type=float, default=0.2, help="Fraction of tabs that start an SSO flow")
+    parser.add_argument("--idle-ttl", type=float, default=30, help="SESSION_IDLE_TTL of the server")
+    parser.add_argument("--sweep-interval", type=float, default=2, help="SESSION_SWEEP_INTERVAL of the server")
+    parser.add_argument("--state-capacity", type=int, default=1000, help="SESSION_STATE_CAPACITY of the server (at most --sessions)")
+    parser.add_argument("--concurrency", type=int, default=16, help="Tabs opened at the same time")
+    parser.add_argument("--port", type=int, default=7870)
+    parser.add_argument("--max-growth-kb", type=float, default=8, help="Allowed RSS growth per session after the first round, in KiB")
+    args = parser.parse_args()
+
+    try:
+        run(args)
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
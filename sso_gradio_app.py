@@ -1,7 +1,8 @@
 import gradio as gr
 import os
 from dotenv import load_dotenv
-from descope import DescopeClient, AuthException
+from descope import AuthException
+from descope_clients import get_descope_client
 from flask import Flask, request, redirect
 from threading import Thread
 import logging
@@ -18,11 +19,17 @@ PROJECT_ID = os.getenv("PROJECT_ID")
 if not PROJECT_ID:
     raise ValueError("PROJECT_ID environment variable is not set")
 
-descope_client = DescopeClient(project_id=PROJECT_ID)
+descope_client = get_descope_client(PROJECT_ID)
 
 # Flask app setup
 app_flask = Flask(__name__)
 
+# Constants for URLs
+GRADIO_PORT = int(os.getenv("GRADIO_PORT", "7864"))
+FLASK_PORT = int(os.getenv("FLASK_PORT", "7863"))
+BASE_URL = f"http://127.0.0.1:{GRADIO_PORT}"
+FLASK_URL = f"http://127.0.0.1:{FLASK_PORT}"
+
 def start_sso_flow(tenant_id):
     """Start the SSO authentication flow for a specific tenant"""
     logger.info(f"Starting SSO flow for tenant ID: {tenant_id}")
@@ -32,7 +39,7 @@ def start_sso_flow(tenant_id):
         return gr.update(), "Please provide a tenant ID."
 
     try:
-        return_url = "http://127.0.0.1:7863/handle-sso"
+        return_url = f"{FLASK_URL}/handle-sso"
         logger.info(f"Configured return URL: {return_url}")
                 
         # Start SSO flow
@@ -84,7 +91,7 @@ def handle_sso():
 
         logger.info("Session validated and tokens extracted")
         # Redirect to Gradio interface with session tokens
-        return redirect(f'http://127.0.0.1:7864/?success=true&session_token={session_token}&refresh_token={refresh_token}')
+        return redirect(f'{BASE_URL}/?success=true&session_token={session_token}&refresh_token={refresh_token}')
     
     except Exception as e:
         logger.error(f"Token exchange failed: {str(e)}", exc_info=True)
@@ -216,7 +223,7 @@ def create_app():
 
 if __name__ == "__main__":
     # Start Flask server in a separate thread without debug mode
-    flask_thread = Thread(target=lambda: app_flask.run(host='127.0.0.1', port=7863, debug=False, use_reloader=False))
+    flask_thread = Thread(target=lambda: app_flask.run(host='127.0.0.1', port=FLASK_PORT, debug=False, use_reloader=False))
     flask_thread.daemon = True
     flask_thread.start()
     
@@ -224,4 +231,4 @@ if __name__ == "__main__":
     logger.info("Starting Gradio interface")
 
     gradio_app = create_app()
-    gradio_app.launch(server_name="127.0.0.1", server_port=7864, share=False)
+    gradio_app.launch(server_name="127.0.0.1", server_port=GRADIO_PORT, share=False)